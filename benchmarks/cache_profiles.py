@@ -0,0 +1,123 @@
+"""compares startup time and memory of the cache profiles against a fake gateway
+
+usage (from the repository root):
+
+    python -m benchmarks.cache_profiles --guilds 50 --members 5000 --messages 20000
+
+every profile runs in its own process so the resident set sizes are comparable
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import discord
+from discord.ext import commands
+
+from core.cache import CacheProfile
+
+from .fake_gateway import FakeGateway
+
+PROFILES = ("full", "lean", "minimal")
+
+
+async def _wait_or_raise(coro, task: asyncio.Task) -> None:
+    # surfaces errors from the connection task instead of waiting forever
+    waiter = asyncio.ensure_future(coro)
+    await asyncio.wait((waiter, task), return_when=asyncio.FIRST_COMPLETED)
+    if not waiter.done():
+        waiter.cancel()
+        task.result()
+    waiter.result()
+
+
+async def run_profile(name: str, args: argparse.Namespace) -> dict:
+    gateway = FakeGateway(guilds=args.guilds, members=args.members, messages=args.messages)
+    await gateway.start()
+    discord.http.Route.BASE = gateway.api_base
+
+    profile = CacheProfile.from_config({"profile": name})
+    bot = commands.AutoShardedBot(command_prefix="a!", **profile.to_kwargs())
+
+    received = 0
+    all_received = asyncio.Event()
+
+    async def on_message(message: discord.Message) -> None:
+        nonlocal received
+        received += 1
+        if received >= args.messages:
+            all_received.set()
+
+    bot.add_listener(on_message)
+    if args.messages == 0:
+        all_received.set()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await bot.login("fake.token")
+    task = asyncio.create_task(bot.connect())
+
+    await _wait_or_raise(bot.wait_until_ready(), task)
+    ready = time.perf_counter() - start
+
+    await _wait_or_raise(asyncio.wait_for(all_received.wait(), timeout=120), task)
+    current, peak = tracemalloc.get_traced_memory()
+
+    result = {
+        "profile": name,
+        "ready_seconds": round(ready, 3),
+        "traced_mib": round(current / 2**20, 2),
+        "traced_peak_mib": round(peak / 2**20, 2),
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        "guilds": len(bot.guilds),
+        "cached_members": sum(len(g.members) for g in bot.guilds),
+        "cached_users": len(bot.users),
+        "cached_messages": len(bot.cached_messages),
+    }
+
+    await bot.close()
+    task.cancel()
+    await gateway.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--profile", choices=PROFILES, action="append")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(run_profile(args.profile[0], args))
+        print(json.dumps(result))
+        return
+
+    base = [
+        sys.executable, "-m", "benchmarks.cache_profiles", "--child",
+        "--guilds", str(args.guilds),
+        "--members", str(args.members),
+        "--messages", str(args.messages),
+    ]
+
+    results = []
+    for name in args.profile or PROFILES:
+        out = subprocess.run(base + ["--profile", name], capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    columns = list(results[0])
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    main()
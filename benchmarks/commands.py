@@ -0,0 +1,208 @@
+"""measures how many commands per second the bot can process, without a
+connection to discord
+
+usage (from the repository root):
+
+    python -m benchmarks.commands --iterations 2000
+    python -m benchmarks.commands --command "help" --command "eval 1 + 1"
+
+fake guilds, members and messages are built straight into the connection
+state, and the rest api is replaced by a stub that answers every request
+instantly, so this measures prefix parsing, converters, checks and the
+cogs themselves, every message goes through ``Amyrin.process_commands``
+like the ones from the gateway do
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import tracemalloc
+from typing import Any
+
+import discord
+
+from core import Amyrin
+from core.config import Config
+
+from .fake_gateway import BOT_ID, EPOCH, FakeGateway, _snowflake, _user
+
+# one of the owner ids, so owner only commands pass their checks
+OWNER_ID = 424548154403323934
+
+# {member} is replaced with the id of a member in the benchmark guild, the
+# generated members have ids too short for the id converters, so it's the owner
+DEFAULT_COMMANDS = (
+    "help",
+    "help eval",
+    "eval 1 + 1",
+    "commandstats",
+    "as {member} help",
+    "doesnotexist",
+)
+
+
+def build_bot(args: argparse.Namespace) -> Amyrin:
+    config = Config.from_dict(
+        {
+            "token": "benchmark",
+            "version": "production",
+            "log_level": "WARNING",
+            # converters fall back to the api or the gateway for uncached members, neither exists here
+            "cache": {"profile": args.cache},
+            # the benchmark is about the bot, not about waiting for rate limits
+            "sender": {"channel_rate": 1_000_000, "global_rate": 1_000_000, "max_queue": 1_000_000},
+        }
+    )
+    return Amyrin(config=config)
+
+
+def populate(bot: Amyrin, args: argparse.Namespace) -> list[discord.TextChannel]:
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=_user(str(BOT_ID), bot=True)) # type: ignore
+
+    fake = FakeGateway(guilds=args.guilds, members=args.members, large_threshold=args.members + 1)
+    channels = []
+    for guild_id in fake.guild_ids(0):
+        data = fake.guild_payload(guild_id)
+        data["members"].append(
+            {"user": _user(str(OWNER_ID)), "roles": [], "joined_at": EPOCH, "deaf": False, "mute": False, "flags": 0}
+        )
+        guild = discord.Guild(data=data, state=state) # type: ignore
+        state._add_guild(guild)
+        channels.append(guild.text_channels[0])
+    return channels
+
+
+def stub_http(bot: Amyrin) -> None:
+    counter = iter(range(10**12))
+
+    async def request(route: discord.http.Route, **kwargs: Any) -> Any:
+        if route.path.endswith("/messages") or "/messages/{message_id}" in route.path:
+            payload = kwargs.get("json") or {}
+            return {
+                "id": _snowflake(5_000_000 + next(counter)),
+                "channel_id": str(route.channel_id),
+                "author": _user(str(BOT_ID), bot=True),
+                "content": payload.get("content") or "",
+                "timestamp": EPOCH,
+                "edited_timestamp": None,
+                "tts": False,
+                "mention_everyone": False,
+                "mentions": [],
+                "mention_roles": [],
+                "attachments": [],
+                "embeds": [],
+                "pinned": False,
+                "type": 0,
+            }
+        return {}
+
+    bot.http.request = request # type: ignore
+
+
+def make_message(bot: Amyrin, channel: discord.TextChannel, author_id: int, content: str, index: int) -> discord.Message:
+    data = {
+        "id": _snowflake(1_000_000 + index),
+        "channel_id": str(channel.id),
+        "guild_id": str(channel.guild.id),
+        "author": _user(str(author_id)),
+        "member": {"roles": [], "joined_at": EPOCH, "deaf": False, "mute": False, "flags": 0},
+        "content": content,
+        "timestamp": EPOCH,
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+    return discord.Message(state=bot._connection, channel=channel, data=data) # type: ignore
+
+
+async def settle() -> None:
+    # lets error handlers and other tasks spawned by the command finish
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def run_command(bot: Amyrin, channels: list[discord.TextChannel], command: str, args: argparse.Namespace) -> dict:
+    content = f"a!{command.format(member=OWNER_ID)}"
+    messages = [
+        make_message(bot, channels[i % len(channels)], OWNER_ID, content, i)
+        for i in range(args.warmup + args.iterations)
+    ]
+
+    for message in messages[: args.warmup]:
+        await bot.process_commands(message)
+        await settle()
+
+    latencies = []
+    start = time.perf_counter()
+    for message in messages[args.warmup :]:
+        before = time.perf_counter()
+        await bot.process_commands(message)
+        latencies.append(time.perf_counter() - before)
+        await settle()
+    elapsed = time.perf_counter() - start
+
+    # a separate pass, tracing allocations slows everything down a lot
+    samples = messages[args.warmup : args.warmup + args.alloc_iterations]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peaks = []
+    for message in samples:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await bot.process_commands(message)
+        await settle()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "command": command,
+        "cmd/s": round(args.iterations / elapsed, 1),
+        "p50_us": round(statistics.median(latencies) * 1e6, 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99) - 1] * 1e6, 1),
+        "peak_kib": round(statistics.median(peaks) / 1024, 1),
+        "retained_b": round(retained / max(len(samples), 1)),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    logging.disable(logging.WARNING)
+
+    bot = build_bot(args)
+    stub_http(bot)
+    channels = populate(bot, args)
+
+    # entering the bot sets up its loop without logging in
+    async with bot:
+        await bot.load_extensions()
+        results = [await run_command(bot, channels, command, args) for command in args.command or DEFAULT_COMMANDS]
+
+    columns = list(results[0])
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--alloc-iterations", type=int, default=200, help="iterations traced for allocations")
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--members", type=int, default=100, help="members per guild")
+    parser.add_argument("--cache", default="full", help="cache profile, see core/cache.py")
+    parser.add_argument(
+        "--command", action="append", help="command without the prefix, can be repeated, {member} is a member id"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,257 @@
+"""a tiny local stand-in for the discord gateway and the rest api endpoints
+needed to log in, so startup and cache behaviour can be measured offline
+
+this only speaks enough of the protocol for discord.py to reach READY,
+receive guilds, answer member chunk requests and get some messages
+"""
+
+import asyncio
+import datetime
+import json
+from typing import Any
+
+from aiohttp import WSMsgType, web
+
+EPOCH = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc).isoformat()
+BOT_ID = 1 << 22
+
+
+def _json(data: Any) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly application/json
+    return web.Response(body=json.dumps(data).encode(), headers={"Content-Type": "application/json"})
+
+
+def _snowflake(index: int) -> str:
+    return str((index + 1) << 22)
+
+
+def _user(user_id: str, *, bot: bool = False) -> dict[str, Any]:
+    return {
+        "id": user_id,
+        "username": f"user{user_id}",
+        "discriminator": "0001",
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def _member(user_id: str) -> dict[str, Any]:
+    return {
+        "user": _user(user_id),
+        "roles": [],
+        "joined_at": EPOCH,
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+class FakeGateway:
+    def __init__(
+        self,
+        *,
+        guilds: int = 10,
+        members: int = 1000,
+        messages: int = 0,
+        shards: int = 1,
+        large_threshold: int = 250,
+    ) -> None:
+        self.guilds = guilds
+        self.members = members
+        self.messages = messages
+        self.shards = shards
+        self.large_threshold = large_threshold
+
+        self.app = web.Application()
+        self.app.router.add_get("/api/v10/users/@me", self.users_me)
+        self.app.router.add_get("/api/v10/oauth2/applications/@me", self.application)
+        self.app.router.add_get("/api/v10/gateway/bot", self.gateway_bot)
+        self.app.router.add_get("/gateway", self.websocket)
+
+        self.runner: web.AppRunner | None = None
+        self.port: int | None = None
+
+    @property
+    def api_base(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v10"
+
+    async def start(self) -> None:
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    async def close(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def guild_ids(self, shard_id: int) -> list[str]:
+        ids = [_snowflake(1000 + i) for i in range(self.guilds)]
+        return [i for i in ids if (int(i) >> 22) % self.shards == shard_id]
+
+    def guild_payload(self, guild_id: str) -> dict[str, Any]:
+        large = self.members > self.large_threshold
+        members = [_member(str(BOT_ID))]
+        if not large:
+            members += [_member(_snowflake(10_000 + i)) for i in range(self.members)]
+
+        return {
+            "id": guild_id,
+            "name": f"guild {guild_id}",
+            "icon": None,
+            "owner_id": str(BOT_ID),
+            "unavailable": False,
+            "large": large,
+            "member_count": self.members + 1,
+            "joined_at": EPOCH,
+            "roles": [
+                {
+                    "id": guild_id,
+                    "name": "@everyone",
+                    "permissions": "0",
+                    "position": 0,
+                    "color": 0,
+                    "hoist": False,
+                    "managed": False,
+                    "mentionable": False,
+                }
+            ],
+            "channels": [
+                {
+                    "id": guild_id,
+                    "type": 0,
+                    "name": "general",
+                    "position": 0,
+                    "permission_overwrites": [],
+                }
+            ],
+            "members": members,
+            "emojis": [],
+            "stickers": [],
+            "features": [],
+            "voice_states": [],
+            "presences": [],
+            "threads": [],
+            "stage_instances": [],
+            "guild_scheduled_events": [],
+        }
+
+    def message_payload(self, guild_id: str, index: int) -> dict[str, Any]:
+        author = _snowflake(10_000 + index % max(self.members, 1))
+        return {
+            "id": _snowflake(1_000_000 + index),
+            "channel_id": guild_id,
+            "guild_id": guild_id,
+            "author": _user(author),
+            "member": {"roles": [], "joined_at": EPOCH, "deaf": False, "mute": False, "flags": 0},
+            "content": f"message {index}",
+            "timestamp": EPOCH,
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": [],
+            "pinned": False,
+            "type": 0,
+        }
+
+    async def users_me(self, request: web.Request) -> web.Response:
+        return _json(_user(str(BOT_ID), bot=True))
+
+    async def application(self, request: web.Request) -> web.Response:
+        return _json(
+            {
+                "id": str(BOT_ID),
+                "name": "amyrin",
+                "description": "",
+                "icon": None,
+                "rpc_origins": [],
+                "bot_public": False,
+                "bot_require_code_grant": False,
+                "owner": _user(_snowflake(0)),
+                "verify_key": "",
+                "flags": 0,
+            }
+        )
+
+    async def gateway_bot(self, request: web.Request) -> web.Response:
+        return _json(
+            {
+                "url": f"ws://127.0.0.1:{self.port}/gateway",
+                "shards": self.shards,
+                "session_start_limit": {
+                    "total": 1000,
+                    "remaining": 1000,
+                    "reset_after": 0,
+                    "max_concurrency": 1,
+                },
+            }
+        )
+
+    async def websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        seq = 0
+
+        async def dispatch(event: str, data: dict[str, Any]) -> None:
+            nonlocal seq
+            seq += 1
+            await ws.send_str(json.dumps({"op": 0, "t": event, "s": seq, "d": data}))
+
+        await ws.send_str(json.dumps({"op": 10, "d": {"heartbeat_interval": 41250}}))
+
+        async for msg in ws:
+            if msg.type is not WSMsgType.TEXT:
+                break
+
+            payload = json.loads(msg.data)
+            op, data = payload["op"], payload["d"]
+
+            if op == 1:
+                await ws.send_str(json.dumps({"op": 11}))
+
+            elif op == 2:
+                shard_id, _ = data.get("shard", [0, 1])
+                guild_ids = self.guild_ids(shard_id)
+                await dispatch(
+                    "READY",
+                    {
+                        "v": 10,
+                        "user": _user(str(BOT_ID), bot=True),
+                        "guilds": [{"id": i, "unavailable": True} for i in guild_ids],
+                        "session_id": f"fake-session-{shard_id}",
+                        "resume_gateway_url": f"ws://127.0.0.1:{self.port}/gateway",
+                        "shard": [shard_id, self.shards],
+                        "application": {"id": str(BOT_ID), "flags": 0},
+                    },
+                )
+                for guild_id in guild_ids:
+                    await dispatch("GUILD_CREATE", self.guild_payload(guild_id))
+
+                for index in range(self.messages):
+                    guild_id = guild_ids[index % len(guild_ids)]
+                    await dispatch("MESSAGE_CREATE", self.message_payload(guild_id, index))
+                    if index % 500 == 0:
+                        await asyncio.sleep(0)
+
+            elif op == 8:
+                guild_id = str(data["guild_id"])
+                members = [_member(_snowflake(10_000 + i)) for i in range(self.members)]
+                chunks = [members[i : i + 1000] for i in range(0, len(members), 1000)] or [[]]
+                for index, chunk in enumerate(chunks):
+                    await dispatch(
+                        "GUILD_MEMBERS_CHUNK",
+                        {
+                            "guild_id": guild_id,
+                            "members": chunk,
+                            "chunk_index": index,
+                            "chunk_count": len(chunks),
+                            "nonce": data.get("nonce"),
+                        },
+                    )
+
+        return ws
@@ -0,0 +1,94 @@
+"""compares a session per request with the shared pooled session against a
+local aiohttp server
+
+usage (from the repository root):
+
+    python -m benchmarks.http_session --requests 2000 --concurrency 20
+
+the server is plain http on localhost, so this measures tcp setup and
+session overhead, real hosts add tls handshakes and dns lookups on top
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from core.http import SessionStats, create_session
+
+
+async def start_server(payload_size: int) -> tuple[web.AppRunner, str]:
+    body = b"x" * payload_size
+
+    async def handler(request: web.Request) -> web.Response:
+        return web.Response(body=body)
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    return runner, f"http://127.0.0.1:{port}/"
+
+
+async def run(mode: str, url: str, args: argparse.Namespace) -> dict:
+    stats = SessionStats()
+    shared = create_session({"limit_per_host": args.concurrency}, stats) if mode == "shared" else None
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+
+    async def fetch() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            if shared is not None:
+                async with shared.get(url) as resp:
+                    await resp.read()
+            else:
+                async with aiohttp.ClientSession(trace_configs=[stats.trace_config()]) as session:
+                    async with session.get(url) as resp:
+                        await resp.read()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    if shared is not None:
+        await shared.close()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "req/s": round(args.requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "connections": stats.connections_created,
+        "reused": stats.connections_reused,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    runner, url = await start_server(args.payload)
+    try:
+        results = [await run(mode, url, args) for mode in ("fresh", "shared")]
+    finally:
+        await runner.cleanup()
+
+    columns = list(results[0])
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--payload", type=int, default=1024, help="response size in bytes")
+    asyncio.run(main(parser.parse_args()))
@@ -1,77 +1,438 @@
+import asyncio
+from collections import deque
+import contextlib
+import signal
 import sys
+import time
 import traceback
 import discord
-import yaml
 import os
 from discord.ext import commands
+from discord.gateway import DiscordWebSocket
+from discord.shard import Shard
+import yarl
 from aiohttp import ClientSession
 from pathlib import Path
 import logging
-from git.repo import Repo
 
-config = yaml.load(open("config.yml"), Loader=yaml.Loader)
+from utils.executor import configure_pools, shutdown_pools
 
-if config["version"] not in ("development", "production"):
-    raise TypeError('version key in config needs to be either "development" or "production"')
+from .config import Config, ConfigWatcher, get_config, is_live
+from .errors import ErrorStore
+from .git import Git
+from .http import SessionStats, create_session
+from .log import setup_logging
+from .ipc import IPCClient, IPCError
+from .memory import MemoryTracer
+from .metrics import AmyrinContext, CommandMetrics
+from .prefixes import PrefixStore, get_prefix
+from .sessions import RESUMABLE_CLOSE_CODE, SavedSession, SessionStore, fetch_shard_guilds, list_guild_ids
+from .sender import Priority, SendScheduler, priority, send_priority
+from .startup import ExtensionTiming, StartupProfile, TimedLoader
+from .tree import SyncResult, TreeSync
+from .watchdog import LoopWatchdog, install_uvloop
 
 class Amyrin(commands.AutoShardedBot):
     session: ClientSession
     logger: logging.Logger
     
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        cluster_id: int | None = None,
+        cluster_count: int = 1,
+        ipc: IPCClient | None = None,
+        config: Config | None = None,
+        **options,
+    ) -> None:
+        self.config = config or get_config()
+        self.cache_profile = self.config.cache
+        
         super().__init__(
-            command_prefix="a!",
-            intents=discord.Intents.all(),
+            command_prefix=get_prefix,
             allowed_mentions=discord.AllowedMentions.none(),
             description=(
                 "cool private bot by syrice#7165"
-            )
+            ),
+            **self.cache_profile.to_kwargs(),
+            **options
         )
         
         self.owner_ids = {424548154403323934}
         
-        self.config = config
-        self.git = Repo()
+        self.prefixes = PrefixStore(self.config.prefixes)
+        
+        self.git = Git()
+        
+        self.cluster_id = cluster_id
+        self.ipc = ipc
+        
+        # started by run, so the bot can be built without taking over logging
+        self.log_listener: logging.handlers.QueueListener | None = None
+        
+        configure_pools(self.config.executors)
+        
+        # bumped whenever extensions change, so caches built from commands know to rebuild
+        self.extension_generation = 0
+        
+        self.http_stats = SessionStats()
+        
+        self.metrics = CommandMetrics(self.config.metrics_ring_size)
+        
+        self.error_store = ErrorStore()
+        
+        # every message the bot creates goes through the scheduler so it never hits a 429
+        self.sender = SendScheduler(self.http.send_message, self.config.sender, clusters=cluster_count)
+        self.http.send_message = self.sender.send_message # type: ignore
+        
+        self.config_watcher = ConfigWatcher(self.apply_config)
+        
+        self.startup = StartupProfile()
+        
+        # tracing is started from the memory command, kept here so it survives reloading the cog
+        self.memory = MemoryTracer()
+        
+        self.watchdog = LoopWatchdog(
+            threshold=self.config.loop.get("lag_threshold", 0.25),
+            interval=self.config.loop.get("lag_interval", 0.1),
+        )
+        
+        self.tree_sync = TreeSync(self.tree, self.config.app_commands.get("sync_file", "command_tree.json"))
+        self._tree_sync_task: asyncio.Task | None = None
+        
+        self.sessions = SessionStore(self.config.gateway, cluster_id)
+        # read when the first shard launches, the shard count isn't known before that
+        self._saved_sessions: dict[int, SavedSession] | None = None
+        # shard id to when it started resuming, until it's resumed or identified
+        self._resuming: dict[int, float] = {}
+        self._guild_ids: asyncio.Task[list[int]] | None = None
         
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.DEBUG if self.is_development else logging.INFO)        
+        self.logger.setLevel(self.config.log_level)        
         
     @property
-    def is_development(self) -> None:
-        return self.config["version"] == "development"
+    def is_development(self) -> bool:
+        return self.config.is_development
+        
+    async def apply_config(self, config: Config) -> None:
+        """applies the keys of a changed config that are safe to change live"""
+        
+        changed = self.config.changed_keys(config)
+        if not changed:
+            return
+        
+        if "log_level" in changed or "version" in changed:
+            self.logger.setLevel(config.log_level)
+        
+        if "cache.max_messages" in changed:
+            state = self._connection
+            max_messages = config.cache.max_messages
+            state.max_messages = max_messages
+            state._messages = deque(state._messages or (), maxlen=max_messages) if max_messages else None
+        
+        if "metrics.ring_size" in changed:
+            self.metrics.resize(config.metrics_ring_size)
+        
+        if any(key.startswith("executors.") for key in changed):
+            configure_pools(config.executors)
+        
+        # live keys that are read on use, like attachments, only need the new config
+        self.config = config
+        
+        live = sorted(key for key in changed if is_live(key))
+        restart = sorted(key for key in changed if not is_live(key))
+        if live:
+            self.logger.info(f"Applied config changes: {', '.join(live)}")
+        if restart:
+            self.logger.warning(f"Config changes that need a restart: {', '.join(restart)}")
         
     def setup_logger(self) -> None:
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG if self.development else logging.INFO)
+        self.log_listener = setup_logging(self.config.log)
         
-        handler = logging.StreamHandler(sys.stdout)
-        dt_fmt = "%Y-%m-%d %H:%M:%S"
-        formatter = logging.Formatter(
-            "[{asctime}] [{levelname:<8}] {name}: {message}", dt_fmt, style="{"
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(self.config.log_level)
+        
+    def run(self, token: str, **kwargs) -> None:
+        # discord.py would add its own synchronous handler otherwise
+        kwargs.setdefault("log_handler", None)
+        
+        try:
+            self.setup_logger()
+            if self.config.loop.get("uvloop"):
+                install_uvloop()
+            
+            super().run(token, **kwargs)
+        finally:
+            # flushes whatever is still queued
+            if self.log_listener is not None:
+                self.log_listener.stop()
+        
+    async def before_identify_hook(self, shard_id: int | None, *, initial: bool = False) -> None:
+        if self.ipc is None:
+            return await super().before_identify_hook(shard_id, initial=initial)
+        
+        # the launcher staggers identifies across every cluster
+        try:
+            await self.ipc.wait_for_identify(shard_id or 0)
+        except (IPCError, ConnectionError, asyncio.TimeoutError) as exc:
+            self.logger.warning(f"Couldn't get an identify slot from the launcher, identifying on our own: {exc!r}")
+            await super().before_identify_hook(shard_id, initial=initial)
+        
+    async def get_context(self, origin, /, *, cls=AmyrinContext):
+        return await super().get_context(origin, cls=cls)
+        
+    async def invoke(self, ctx: commands.Context) -> None:
+        urgent = ctx.interaction is not None or ctx.author.id in self.owner_ids
+        with priority(Priority.HIGH if urgent else send_priority.get()):
+            async with self.metrics.track(ctx):
+                await super().invoke(ctx)
+        
+    async def on_shard_ready(self, shard_id: int) -> None:
+        self.startup.shards_ready.setdefault(shard_id, self.startup.since_start())
+        
+        started = self._resuming.pop(shard_id, None)
+        if started is not None:
+            self.logger.warning(
+                f"Shard {shard_id} couldn't resume its session, identified in {time.perf_counter() - started:.2f}s"
+            )
+        self._dispatch_ready_if_complete()
+        
+    async def on_shard_resumed(self, shard_id: int) -> None:
+        started = self._resuming.pop(shard_id, None)
+        if started is None:
+            # an ordinary reconnect, the cache is still there
+            return
         
-        self.logger = logger
+        self.logger.info(f"Shard {shard_id} resumed in {time.perf_counter() - started:.2f}s")
+        self.startup.shards_resumed.add(shard_id)
+        
+        start = time.perf_counter()
+        try:
+            loaded = await fetch_shard_guilds(self, await self._list_guild_ids(), shard_id, self.shard_count) # type: ignore
+        except Exception:
+            self.logger.exception(f"Failed to load the guilds of shard {shard_id} after resuming")
+        else:
+            self.logger.info(f"Loaded {loaded} guild(s) of shard {shard_id} in {time.perf_counter() - start:.2f}s")
+        finally:
+            # a shard without its guilds is still connected, it mustn't keep the bot from becoming ready
+            self.startup.shards_ready.setdefault(shard_id, self.startup.since_start())
+            self._dispatch_ready_if_complete()
+        
+    async def _list_guild_ids(self) -> list[int]:
+        # every resumed shard needs the same list, so it's only fetched once
+        if self._guild_ids is None:
+            self._guild_ids = asyncio.create_task(list_guild_ids(self))
+        task = self._guild_ids
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # the next resumed shard tries again instead of getting the same error
+            if self._guild_ids is task:
+                self._guild_ids = None
+            raise
+        
+    def _dispatch_ready_if_complete(self) -> None:
+        # discord.py only becomes ready once every shard got READY, which resumed
+        # shards never do, so with any of them around the last shard to finish
+        # (resumed or identified) dispatches it instead
+        if self.is_ready() or not self.startup.shards_resumed:
+            return
+        if len(self.startup.shards_ready) < len(self._connection.shard_ids or ()):
+            return
+        
+        state = self._connection
+        state._ready_task = None
+        state._ready_tasks = {}
+        state.call_handlers("ready")
+        self.dispatch("ready")
         
     async def on_ready(self) -> None:
         self.logger.info("Ready")
         
+        if self.startup.ready_at is None:
+            self.startup.ready_at = self.startup.since_start()
+            self.logger.info(f"Startup profile:\n{self.startup.format()}")
+        
     async def on_connect(self) -> None:
         self.logger.info("Connected")
         
+    async def _load_from_module_spec(self, spec, key: str) -> None:
+        timing = self.startup.extensions[key] = ExtensionTiming(key)
+        loader = spec.loader
+        spec.loader = TimedLoader(loader, timing)
+        
+        start = time.perf_counter()
+        try:
+            await super()._load_from_module_spec(spec, key)
+        except Exception as exc:
+            timing.error = type(exc).__name__
+            raise
+        finally:
+            timing.setup_time = time.perf_counter() - start - timing.import_time
+            spec.loader = loader
+            module = sys.modules.get(key)
+            if module is not None:
+                module.__loader__ = loader
+        
+    async def load_extension(self, name: str, *, package: str | None = None) -> None:
+        try:
+            await super().load_extension(name, package=package)
+        finally:
+            self.extension_generation += 1
+        
+    async def unload_extension(self, name: str, *, package: str | None = None) -> None:
+        try:
+            await super().unload_extension(name, package=package)
+        finally:
+            self.extension_generation += 1
+        
+    async def reload_extension(self, name: str, *, package: str | None = None) -> None:
+        try:
+            await super().reload_extension(name, package=package)
+        finally:
+            self.extension_generation += 1
+        
+    async def _load_extension_logged(self, name: str) -> None:
+        try:
+            await self.load_extension(name)
+        except Exception as exc:
+            self.logger.error(f'The following exception occured while trying to load extension "{name}":')
+            traceback.print_exc()
+        
     async def load_extensions(self) -> None:
         path = Path("exts")
         
-        for file in path.glob("*.py"):
-            name = str(file).replace(os.sep, ".")[:-3]
-            try:
-                await self.load_extension(name)
-            except Exception as exc:
-                self.logger.error(f'The following exception occured while trying to load extension "{name}":')
-                traceback.print_exc()
+        # imports still run one at a time, but the async parts of each setup overlap
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(self._load_extension_logged(str(file).replace(os.sep, ".")[:-3]) for file in path.glob("*.py"))
+        )
+        self.startup.extensions_total = time.perf_counter() - start
+            
+    async def launch_shard(self, gateway: yarl.URL, shard_id: int, *, initial: bool = False) -> None:
+        if self._saved_sessions is None:
+            self._saved_sessions = await asyncio.to_thread(self.sessions.load, self.shard_count) # type: ignore
+        
+        saved = self._saved_sessions.pop(shard_id, None)
+        if saved is None:
+            return await super().launch_shard(gateway, shard_id, initial=initial)
+        
+        started = time.perf_counter()
+        try:
+            coro = DiscordWebSocket.from_client(
+                self,
+                initial=initial,
+                gateway=yarl.URL(saved.resume_url),
+                shard_id=shard_id,
+                session=saved.session_id,
+                sequence=saved.sequence,
+                resume=True,
+            )
+            ws = await asyncio.wait_for(coro, timeout=180.0)
+        except Exception as exc:
+            self.logger.warning(f"Shard {shard_id} failed to resume, identifying instead: {exc}")
+            return await super().launch_shard(gateway, shard_id, initial=initial)
+        
+        self._resuming[shard_id] = started
+        # the rest of what AutoShardedClient.launch_shard does, its attributes are name mangled
+        shard = Shard(ws, self, self._AutoShardedClient__queue.put_nowait) # type: ignore
+        self._AutoShardedClient__shards[shard_id] = shard # type: ignore
+        shard.launch()
+        
+    async def save_sessions(self) -> None:
+        """closes the shards without ending their sessions and saves them for the next start"""
+        
+        sessions = []
+        shards: dict[int, Shard] = self._AutoShardedClient__shards # type: ignore
+        for shard_id, shard in shards.items():
+            # stop reading first so the sequence number can't move past what's saved
+            shard._cancel_task()
+            ws = shard.ws
+            if ws.session_id is None:
+                continue
             
+            sessions.append(SavedSession(shard_id, ws.session_id, ws.sequence, str(ws.gateway)))
+            with contextlib.suppress(Exception):
+                await ws.close(code=RESUMABLE_CLOSE_CODE)
+        
+        if sessions:
+            await asyncio.to_thread(self.sessions.save, self.shard_count, sessions) # type: ignore
+            self.logger.info(f"Saved {len(sessions)} gateway session(s) to {self.sessions.path}")
+        
     async def setup_hook(self) -> None:
-        discord.utils.setup_logging()
+        # setup_hook runs right after logging in
+        self.startup.login_at = self.startup.since_start()
+        
+        self.watchdog.start()
+        self.logger.info(f"Running on {self.watchdog.loop_name}")
+        
+        # systemd stops the bot with SIGTERM, closing properly is what lets the sessions be saved
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        
+        self.session = create_session(self.config.http, self.http_stats)
+        self.config_watcher.start()
+        
+        if self.ipc is not None:
+            await self.ipc.connect()
+            self.logger.info(f"Running as cluster {self.cluster_id} with shards {self.shard_ids}")
+        
+        await self.prefixes.load()
+        
+        profile = self.cache_profile
+        self.logger.info(
+            f'Using cache profile "{profile.name}" '
+            f"(intents={profile.intents.value}, member_cache={profile.member_cache_flags.value}, "
+            f"chunking={profile.chunk_guilds_at_startup}, max_messages={profile.max_messages})"
+        )
+        
+        await self.load_extensions()
+        
+        # every cluster has the same tree, one syncing it is enough
+        if self.config.app_commands.get("sync", True) and not self.cluster_id:
+            self._tree_sync_task = asyncio.create_task(self.sync_app_commands())
+        
+    async def sync_app_commands(self, *, force: bool = False) -> list[SyncResult]:
+        """syncs the scopes of the app command tree that changed since their last sync"""
+        
+        try:
+            results = await self.tree_sync.sync(force=force)
+        except Exception:
+            self.logger.exception("Failed to sync the app command tree")
+            return []
+        
+        unchanged = 0
+        for result in results:
+            if result.error is not None:
+                self.logger.warning(f"Failed to sync app commands of {result.scope}: {result.error}")
+            elif result.synced:
+                self.logger.info(f"Synced {result.commands} app command(s) of {result.scope} in {result.elapsed:.2f}s")
+            else:
+                unchanged += 1
+        if unchanged:
+            self.logger.info(f"Skipped syncing {unchanged} unchanged app command scope(s)")
+        return results
+        
+    async def close(self) -> None:
+        self.config_watcher.stop()
+        self.watchdog.stop()
+        self.sender.close()
+        
+        if self.ipc is not None:
+            await self.ipc.close()
+        
+        if self.sessions.enabled and not self.is_closed():
+            try:
+                await self.save_sessions()
+            except Exception:
+                self.logger.exception("Failed to save the gateway sessions")
+        
+        await super().close()
+        
+        if hasattr(self, "session"):
+            await self.session.close()
+        
+        await self.prefixes.close()
         
-        await self.load_extensions()
\ No newline at end of file
+        # waits for running work, so keep it off the loop
+        await asyncio.to_thread(shutdown_pools)
@@ -0,0 +1,107 @@
+from dataclasses import dataclass, replace
+from typing import Any, Optional
+
+import discord
+
+
+@dataclass(frozen=True)
+class CacheProfile:
+    name: str
+    intents: discord.Intents
+    member_cache_flags: discord.MemberCacheFlags
+    chunk_guilds_at_startup: bool
+    max_messages: Optional[int]
+
+    @classmethod
+    def full(cls) -> "CacheProfile":
+        intents = discord.Intents.all()
+        return cls(
+            name="full",
+            intents=intents,
+            member_cache_flags=discord.MemberCacheFlags.from_intents(intents),
+            chunk_guilds_at_startup=True,
+            max_messages=1000,
+        )
+
+    @classmethod
+    def lean(cls) -> "CacheProfile":
+        intents = discord.Intents.default()
+        intents.message_content = True
+        intents.members = True  # lets member lookups query the gateway without caching
+        return cls(
+            name="lean",
+            intents=intents,
+            member_cache_flags=discord.MemberCacheFlags.none(),
+            chunk_guilds_at_startup=False,
+            max_messages=100,
+        )
+
+    @classmethod
+    def minimal(cls) -> "CacheProfile":
+        intents = discord.Intents(
+            guilds=True,
+            guild_messages=True,
+            dm_messages=True,
+            message_content=True,
+        )
+        return cls(
+            name="minimal",
+            intents=intents,
+            member_cache_flags=discord.MemberCacheFlags.none(),
+            chunk_guilds_at_startup=False,
+            max_messages=None,
+        )
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "CacheProfile":
+        """builds a profile from the ``cache`` section of the config
+
+        the ``profile`` key picks one of the presets, every other key
+        overrides that part of the preset
+        """
+
+        name = config.get("profile", "lean")
+        presets = {"full": cls.full, "lean": cls.lean, "minimal": cls.minimal}
+        if name not in presets:
+            raise TypeError(
+                f'cache.profile key in config needs to be one of {", ".join(map(repr, presets))}'
+            )
+
+        profile = presets[name]()
+        overrides: dict[str, Any] = {}
+
+        if (intents := config.get("intents")) is not None:
+            overrides["intents"] = _build_flags(discord.Intents, intents, "cache.intents")
+        if (flags := config.get("member_cache")) is not None:
+            overrides["member_cache_flags"] = _build_flags(
+                discord.MemberCacheFlags, flags, "cache.member_cache"
+            )
+        if "chunk_guilds_at_startup" in config:
+            overrides["chunk_guilds_at_startup"] = bool(config["chunk_guilds_at_startup"])
+        if "max_messages" in config:
+            max_messages = config["max_messages"]
+            if max_messages is not None and (not isinstance(max_messages, int) or max_messages < 0):
+                raise TypeError("cache.max_messages key in config needs to be a positive integer or null")
+            overrides["max_messages"] = max_messages or None
+
+        return replace(profile, **overrides)
+
+    def to_kwargs(self) -> dict[str, Any]:
+        return {
+            "intents": self.intents,
+            "member_cache_flags": self.member_cache_flags,
+            "chunk_guilds_at_startup": self.chunk_guilds_at_startup,
+            "max_messages": self.max_messages,
+        }
+
+
+def _build_flags(cls: type, names: list[str], key: str) -> Any:
+    valid = cls.VALID_FLAGS
+    unknown = [name for name in names if name not in valid]
+    if unknown:
+        raise TypeError(f'{key} key in config contains unknown flags: {", ".join(unknown)}')
+
+    flags = cls.none()
+    for name in names:
+        setattr(flags, name, True)
+    return flags
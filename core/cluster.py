@@ -0,0 +1,173 @@
+"""splits the shards over several processes so the bot isn't stuck on one core
+
+the launcher asks discord for the recommended shard count, starts one
+process per cluster and restarts clusters that die, the clusters talk to
+it over :mod:`core.ipc`
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import secrets
+import signal
+import time
+from dataclasses import dataclass, field
+from multiprocessing.process import BaseProcess
+from typing import Any, Optional
+
+import discord
+from aiohttp import ClientSession
+
+from .config import Config
+from .ipc import IPCClient, IPCServer
+from .log import setup_logging
+
+_log = logging.getLogger(__name__)
+
+# clusters that stayed up this long get their restart backoff reset
+STABLE_AFTER = 300
+
+
+def _run_cluster(
+    cluster_id: int, cluster_count: int, shard_ids: list[int], shard_count: int, port: int, secret: str
+) -> None:
+    from .bot import Amyrin
+
+    ipc = IPCClient(cluster_id=cluster_id, port=port, secret=secret)
+    bot = Amyrin(
+        shard_ids=shard_ids, shard_count=shard_count, cluster_id=cluster_id, cluster_count=cluster_count, ipc=ipc
+    )
+    bot.run(bot.config.token)
+
+
+@dataclass
+class Cluster:
+    id: int
+    shard_ids: list[int]
+    process: Optional[BaseProcess] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    next_start: float = field(default=0.0)
+
+
+class Launcher:
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.cluster_config: dict[str, Any] = config.cluster
+
+        self.clusters: list[Cluster] = []
+        self.secret = secrets.token_hex(32)
+        self.ipc: Optional[IPCServer] = None
+
+        self._context = multiprocessing.get_context("spawn")
+        self._closing = asyncio.Event()
+
+    async def fetch_gateway_info(self) -> tuple[int, int]:
+        async with ClientSession() as session:
+            async with session.get(
+                f"{discord.http.Route.BASE}/gateway/bot",
+                headers={"Authorization": f"Bot {self.config.token}"},
+            ) as resp:
+                resp.raise_for_status()
+                data = await resp.json()
+
+        return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+    def split_shards(self, shard_count: int, cluster_count: int) -> list[list[int]]:
+        cluster_count = max(1, min(cluster_count, shard_count))
+        per_cluster, extra = divmod(shard_count, cluster_count)
+
+        result, start = [], 0
+        for index in range(cluster_count):
+            size = per_cluster + (index < extra)
+            result.append(list(range(start, start + size)))
+            start += size
+        return result
+
+    def start_cluster(self, cluster: Cluster) -> None:
+        assert self.ipc is not None
+
+        process = self._context.Process(
+            target=_run_cluster,
+            args=(cluster.id, len(self.clusters), cluster.shard_ids, self.shard_count, self.ipc.port, self.secret),
+            name=f"amyrin-cluster-{cluster.id}",
+        )
+        process.start()
+
+        cluster.process = process
+        cluster.started_at = time.monotonic()
+        _log.info(
+            f"Started cluster {cluster.id} (pid {process.pid}) "
+            f"with shards {cluster.shard_ids[0]}-{cluster.shard_ids[-1]}"
+        )
+
+    async def watch(self) -> None:
+        while not self._closing.is_set():
+            now = time.monotonic()
+            for cluster in self.clusters:
+                process = cluster.process
+                if process is not None and process.is_alive():
+                    continue
+
+                if process is not None:
+                    if now - cluster.started_at > STABLE_AFTER:
+                        cluster.restarts = 0
+                    delay = min(2 ** cluster.restarts, 60)
+                    cluster.restarts += 1
+                    cluster.next_start = now + delay
+                    cluster.process = None
+                    _log.warning(
+                        f"Cluster {cluster.id} exited with code {process.exitcode}, restarting in {delay}s"
+                    )
+                    process.close()
+
+                if now >= cluster.next_start:
+                    self.start_cluster(cluster)
+
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        self._closing.set()
+
+    async def start(self) -> None:
+        shard_count, max_concurrency = await self.fetch_gateway_info()
+        self.shard_count: int = self.cluster_config.get("shard_count") or shard_count
+
+        self.ipc = IPCServer(
+            port=self.cluster_config.get("ipc_port", 7355),
+            secret=self.secret,
+            max_concurrency=max_concurrency,
+        )
+        await self.ipc.start()
+
+        clusters = self.cluster_config.get("clusters") or multiprocessing.cpu_count()
+        self.clusters = [
+            Cluster(id=index, shard_ids=shard_ids)
+            for index, shard_ids in enumerate(self.split_shards(self.shard_count, clusters))
+        ]
+        _log.info(f"Launching {self.shard_count} shards over {len(self.clusters)} clusters")
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop)
+
+        try:
+            await self.watch()
+        finally:
+            for cluster in self.clusters:
+                if cluster.process is not None and cluster.process.is_alive():
+                    cluster.process.terminate()
+            for cluster in self.clusters:
+                if cluster.process is not None:
+                    await asyncio.to_thread(cluster.process.join, 30)
+            await self.ipc.close()
+
+    def run(self) -> None:
+        listener = setup_logging(self.config.log)
+        try:
+            asyncio.run(self.start())
+        finally:
+            listener.stop()
@@ -0,0 +1,235 @@
+"""typed access to config.yml
+
+the file is only read when something first asks for the config, and it is
+validated once while loading so the rest of the bot can trust the values.
+:class:`ConfigWatcher` picks up edits to the file while the bot is running.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+import yaml
+
+from utils.attachments import AttachmentLimits
+from utils.executor import RETIRED_POOLS, pools
+
+from .cache import CacheProfile
+from .sandbox import SandboxLimits
+
+# the pure python loader is a lot slower, fall back to it only when libyaml is missing
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CONFIG_PATH = Path("config.yml")
+
+# keys that can change while the bot is running, anything else needs a restart
+LIVE_KEYS = {"log_level", "cache.max_messages", "metrics.ring_size", "executors", "attachments"}
+
+_log = logging.getLogger(__name__)
+
+
+def _section(data: dict[str, Any], key: str) -> dict[str, Any]:
+    value = data.get(key) or {}
+    if not isinstance(value, dict):
+        raise TypeError(f"{key} key in config needs to be a mapping")
+    return value
+
+
+@dataclass(frozen=True)
+class Config:
+    token: str
+    version: str
+    log_level: int
+    cache: CacheProfile
+    executors: dict[str, int] = field(default_factory=dict)
+    metrics_ring_size: int = 4096
+    attachments: AttachmentLimits = field(default_factory=AttachmentLimits)
+    http: dict[str, Any] = field(default_factory=dict)
+    sender: dict[str, Any] = field(default_factory=dict)
+    prefixes: dict[str, Any] = field(default_factory=dict)
+    log: dict[str, Any] = field(default_factory=dict)
+    loop: dict[str, Any] = field(default_factory=dict)
+    gateway: dict[str, Any] = field(default_factory=dict)
+    app_commands: dict[str, Any] = field(default_factory=dict)
+    sandbox: SandboxLimits = field(default_factory=SandboxLimits)
+    cluster: dict[str, Any] = field(default_factory=dict)
+    raw: dict[str, Any] = field(default_factory=dict, repr=False)
+
+    @property
+    def is_development(self) -> bool:
+        return self.version == "development"
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Config":
+        if not isinstance(data, dict):
+            raise TypeError("config needs to be a mapping")
+
+        token = data.get("token")
+        if not isinstance(token, str) or not token:
+            raise TypeError("token key in config needs to be a string")
+
+        version = data.get("version")
+        if version not in ("development", "production"):
+            raise TypeError('version key in config needs to be either "development" or "production"')
+
+        log_level = data.get("log_level") or ("DEBUG" if version == "development" else "INFO")
+        level = logging.getLevelName(str(log_level).upper())
+        if not isinstance(level, int):
+            raise TypeError(f'log_level key in config is not a logging level: "{log_level}"')
+
+        executors = dict(_section(data, "executors"))
+        for name in sorted(RETIRED_POOLS.intersection(executors)):
+            # their work moved elsewhere, an old config shouldn't keep the bot from starting
+            _log.warning(f"executors.{name} key in config is for a pool that no longer exists, ignoring it")
+            del executors[name]
+        for name, size in executors.items():
+            if name not in pools:
+                raise TypeError(f'executors key in config contains unknown pool "{name}"')
+            if not isinstance(size, int) or size < 1:
+                raise TypeError(f"executors.{name} key in config needs to be a positive integer")
+
+        ring_size = _section(data, "metrics").get("ring_size", 4096)
+        if not isinstance(ring_size, int) or ring_size < 1:
+            raise TypeError("metrics.ring_size key in config needs to be a positive integer")
+
+        sender = _section(data, "sender")
+        for name, value in sender.items():
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise TypeError(f"sender.{name} key in config needs to be a positive number")
+
+        prefixes = _section(data, "prefixes")
+        default_prefix = prefixes.get("default", "a!")
+        if not isinstance(default_prefix, str) or not default_prefix.strip():
+            raise TypeError("prefixes.default key in config needs to be a non-empty string")
+
+        log = _section(data, "log")
+        if not isinstance(logging.getLevelName(str(log.get("level", "INFO")).upper()), int):
+            raise TypeError(f'log.level key in config is not a logging level: "{log.get("level")}"')
+        sample = log.get("sample") or {}
+        if not isinstance(sample, dict) or not all(
+            isinstance(rate, (int, float)) and 0 <= rate <= 1 for rate in sample.values()
+        ):
+            raise TypeError("log.sample key in config needs to map logger names to rates between 0 and 1")
+
+        loop = _section(data, "loop")
+        for name in ("lag_threshold", "lag_interval"):
+            value = loop.get(name, 1)
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise TypeError(f"loop.{name} key in config needs to be a positive number")
+
+        gateway = _section(data, "gateway")
+        if not isinstance(gateway.get("resume", False), bool):
+            raise TypeError("gateway.resume key in config needs to be a boolean")
+        max_age = gateway.get("max_age", 60)
+        if not isinstance(max_age, (int, float)) or max_age <= 0:
+            raise TypeError("gateway.max_age key in config needs to be a positive number")
+
+        app_commands = _section(data, "app_commands")
+        if not isinstance(app_commands.get("sync", True), bool):
+            raise TypeError("app_commands.sync key in config needs to be a boolean")
+
+        return cls(
+            token=token,
+            version=version,
+            log_level=level,
+            cache=CacheProfile.from_config(_section(data, "cache")),
+            executors=executors,
+            metrics_ring_size=ring_size,
+            attachments=AttachmentLimits.from_config(_section(data, "attachments")),
+            http=_section(data, "http"),
+            sender=sender,
+            prefixes=prefixes,
+            log=log,
+            loop=loop,
+            gateway=gateway,
+            app_commands=app_commands,
+            sandbox=SandboxLimits.from_config(_section(data, "sandbox")),
+            cluster=_section(data, "cluster"),
+            raw=data,
+        )
+
+    def changed_keys(self, other: "Config") -> set[str]:
+        """dotted keys that differ between the two raw configs"""
+
+        def flatten(data: dict[str, Any], prefix: str = "") -> dict[str, Any]:
+            flat = {}
+            for key, value in data.items():
+                if isinstance(value, dict):
+                    flat.update(flatten(value, f"{prefix}{key}."))
+                else:
+                    flat[f"{prefix}{key}"] = value
+            return flat
+
+        ours, theirs = flatten(self.raw), flatten(other.raw)
+        return {key for key in ours.keys() | theirs.keys() if ours.get(key) != theirs.get(key)}
+
+
+def load_config(path: Path = CONFIG_PATH) -> Config:
+    with open(path, encoding="utf-8") as file:
+        return Config.from_dict(yaml.load(file, Loader=Loader))
+
+
+_config: Optional[Config] = None
+
+
+def get_config() -> Config:
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+
+def is_live(key: str) -> bool:
+    return any(key == live or key.startswith(f"{live}.") for live in LIVE_KEYS)
+
+
+class ConfigWatcher:
+    """polls the config file and hands new, valid configs to ``callback``"""
+
+    def __init__(
+        self,
+        callback: Callable[[Config], Awaitable[None]],
+        path: Path = CONFIG_PATH,
+        interval: float = 5.0,
+    ) -> None:
+        self.callback = callback
+        self.path = path
+        self.interval = interval
+        self._mtime = self._stat()
+        self._task: Optional[asyncio.Task] = None
+
+    def _stat(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            mtime = self._stat()
+            if mtime is None or mtime == self._mtime:
+                continue
+            self._mtime = mtime
+
+            try:
+                config = await asyncio.to_thread(load_config, self.path)
+            except Exception as exc:
+                _log.error(f"Ignoring changes to {self.path}, it failed to load: {exc}")
+                continue
+
+            try:
+                await self.callback(config)
+            except Exception:
+                _log.exception(f"Applying changes from {self.path} failed")
@@ -0,0 +1,135 @@
+"""groups command errors by where they come from so a bug in a hot command
+gets reported once per window instead of once per invocation
+
+errors are fingerprinted by exception type and the innermost frame that is
+part of the bot itself, so the same bug hit from different places in a
+library still counts as one error, the store holds a fixed number of them
+"""
+
+import hashlib
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Optional
+
+ROOT = str(Path(__file__).resolve().parent.parent)
+
+# library and stdlib frames live in these, everything else under ROOT is ours
+EXTERNAL = tuple(path for path in {sys.prefix, sys.base_prefix, sys.exec_prefix} if path)
+
+
+def _is_ours(filename: str) -> bool:
+    return filename.startswith(ROOT) and "site-packages" not in filename and not filename.startswith(EXTERNAL)
+
+
+def location(tb: Optional[TracebackType]) -> str:
+    """``file:line in function`` of the innermost frame that belongs to the bot,
+    falling back to the innermost frame of the whole traceback"""
+
+    found = last = None
+    while tb is not None:
+        last = tb
+        if _is_ours(tb.tb_frame.f_code.co_filename):
+            found = tb
+        tb = tb.tb_next
+
+    tb = found or last
+    if tb is None:
+        return "<unknown>"
+
+    code = tb.tb_frame.f_code
+    filename = code.co_filename
+    if filename.startswith(ROOT):
+        filename = filename[len(ROOT) + 1 :]
+    return f"{filename}:{tb.tb_lineno} in {code.co_name}"
+
+
+@dataclass
+class ErrorEntry:
+    fingerprint: str
+    type: str
+    location: str
+    command: Optional[str]
+    message: str
+    first_seen: float
+    last_seen: float
+    count: int = 0
+    # count at the last report, everything after it has been suppressed
+    reported_count: int = 0
+    last_reported: Optional[float] = None
+    _formatted: Optional[str] = None
+
+    @property
+    def suppressed(self) -> int:
+        return self.count - self.reported_count
+
+    def format(self, error: Optional[BaseException] = None) -> str:
+        """the traceback of the first occurrence, formatted once"""
+
+        if self._formatted is None and error is not None:
+            self._formatted = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        return self._formatted or f"{self.type}: {self.message}"
+
+
+class ErrorStore:
+    def __init__(self, max_entries: int = 256, window: float = 300.0) -> None:
+        self.max_entries = max_entries
+        self.window = window
+        # least recently seen first
+        self.entries: "OrderedDict[str, ErrorEntry]" = OrderedDict()
+        self.total = 0
+
+    @staticmethod
+    def fingerprint(error: BaseException) -> tuple[str, str, str]:
+        name = type(error).__qualname__
+        where = location(error.__traceback__)
+        digest = hashlib.sha1(f"{name}@{where}".encode()).hexdigest()[:10]
+        return digest, name, where
+
+    def record(self, error: BaseException, command: Optional[str] = None) -> tuple[ErrorEntry, bool]:
+        """counts the error and returns its entry and whether it should be reported now"""
+
+        now = time.monotonic()
+        self.total += 1
+
+        key, name, where = self.fingerprint(error)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = ErrorEntry(
+                fingerprint=key,
+                type=name,
+                location=where,
+                command=command,
+                message=str(error),
+                first_seen=now,
+                last_seen=now,
+            )
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+
+        entry.count += 1
+        entry.last_seen = now
+
+        if entry.last_reported is not None and now - entry.last_reported < self.window:
+            return entry, False
+        return entry, True
+
+    def mark_reported(self, entry: ErrorEntry) -> None:
+        entry.reported_count = entry.count
+        entry.last_reported = time.monotonic()
+
+    def top(self, limit: int = 10) -> list[ErrorEntry]:
+        return sorted(self.entries.values(), key=lambda entry: entry.count, reverse=True)[:limit]
+
+    def get(self, fingerprint: str) -> Optional[ErrorEntry]:
+        return self.entries.get(fingerprint)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.total = 0
@@ -0,0 +1,107 @@
+"""a small async wrapper around the git cli
+
+every call is a subprocess on the event loop, so nothing blocks while git
+talks to the remote, and calls are killed when they time out or the task
+running them is cancelled
+"""
+
+import asyncio
+import os
+import signal
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+# separates the fields of a --format line, subjects can contain anything else
+FIELD_SEP = "\x1f"
+
+
+class GitError(Exception):
+    def __init__(self, args: tuple[str, ...], returncode: int, stderr: str) -> None:
+        self.command = args
+        self.returncode = returncode
+        self.stderr = stderr
+        super().__init__(f"git {' '.join(args)} exited with {returncode}: {stderr.strip()}")
+
+
+@dataclass(frozen=True)
+class Commit:
+    sha: str
+    author: str
+    subject: str
+
+    @property
+    def short_sha(self) -> str:
+        return self.sha[:7]
+
+
+class Git:
+    def __init__(self, path: str | Path = ".", timeout: float = 60.0) -> None:
+        self.path = Path(path)
+        self.timeout = timeout
+
+    async def run(self, *args: str, timeout: Optional[float] = None) -> str:
+        proc = await asyncio.create_subprocess_exec(
+            "git",
+            *args,
+            cwd=self.path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            # fail instead of waiting forever on a credential prompt nobody can answer
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+            # its own process group, so ssh and hooks get killed with it
+            start_new_session=True,
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout or self.timeout)
+        except BaseException:
+            # timed out or cancelled, don't leave git running in the background
+            if proc.returncode is None:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+            raise
+
+        if proc.returncode != 0:
+            raise GitError(args, proc.returncode, stderr.decode(errors="replace")) # type: ignore
+        return stdout.decode(errors="replace")
+
+    async def rev_parse(self, ref: str = "HEAD") -> str:
+        return (await self.run("rev-parse", "--verify", ref)).strip()
+
+    async def current_branch(self) -> str:
+        return (await self.run("rev-parse", "--abbrev-ref", "HEAD")).strip()
+
+    async def pull(self, remote: str = "origin", branch: Optional[str] = None) -> tuple[str, str]:
+        """fast forwards to the remote and returns the commit ids from before and after"""
+
+        before = await self.rev_parse()
+
+        args = ["pull", "--quiet", "--ff-only", remote]
+        if branch is not None:
+            args.append(branch)
+        await self.run(*args)
+
+        return before, await self.rev_parse()
+
+    async def diff_name_status(self, before: str, after: str = "HEAD") -> list[tuple[str, str]]:
+        """``(change_type, path)`` for every file that differs, renames show up as a delete and an add"""
+
+        if before == after:
+            return []
+
+        # -z keeps paths unquoted, the output alternates status and path
+        output = await self.run("diff", "--name-status", "--no-renames", "-z", before, after)
+        fields = output.split("\0")
+        return [(fields[i][0], fields[i + 1]) for i in range(0, len(fields) - 1, 2)]
+
+    async def log(self, before: Optional[str] = None, after: str = "HEAD", limit: int = 20) -> list[Commit]:
+        revision = f"{before}..{after}" if before is not None else after
+        output = await self.run(
+            "log", f"--max-count={limit}", f"--format=%H{FIELD_SEP}%an{FIELD_SEP}%s", revision
+        )
+        return [Commit(*line.split(FIELD_SEP, 2)) for line in output.splitlines() if line]
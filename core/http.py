@@ -0,0 +1,78 @@
+"""the shared aiohttp session extensions should use instead of opening their own"""
+
+from dataclasses import dataclass
+from typing import Any
+
+import aiohttp
+
+
+@dataclass
+class SessionStats:
+    requests: int = 0
+    failed: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_end(session, ctx, params) -> None:
+            self.requests += 1
+
+        async def on_request_exception(session, ctx, params) -> None:
+            self.failed += 1
+
+        async def on_connection_create_end(session, ctx, params) -> None:
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params) -> None:
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, ctx, params) -> None:
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params) -> None:
+            self.dns_cache_misses += 1
+
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+
+def create_session(config: dict[str, Any], stats: SessionStats | None = None) -> aiohttp.ClientSession:
+    """builds a session from the ``http`` config section"""
+
+    connector = aiohttp.TCPConnector(
+        limit=config.get("limit", 100),
+        limit_per_host=config.get("limit_per_host", 10),
+        use_dns_cache=True,
+        ttl_dns_cache=config.get("dns_cache_ttl", 300),
+        keepalive_timeout=config.get("keepalive_timeout", 30),
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=config.get("timeout", 30)),
+        trace_configs=[stats.trace_config()] if stats is not None else None,
+    )
+
+
+def pool_usage(session: aiohttp.ClientSession) -> dict[str, int]:
+    connector = session.connector
+    if not isinstance(connector, aiohttp.TCPConnector):
+        return {}
+
+    # aiohttp doesn't expose these publicly
+    idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+    in_use = len(getattr(connector, "_acquired", ()))
+    return {
+        "limit": connector.limit,
+        "limit_per_host": connector.limit_per_host,
+        "in_use": in_use,
+        "idle": idle,
+    }
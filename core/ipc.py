@@ -0,0 +1,344 @@
+"""local ipc between the cluster launcher and its cluster processes
+
+messages are json objects sent over a localhost tcp connection, each one
+prefixed with its length so replies of any size fit. every connection has
+to authenticate with the secret the launcher handed to the cluster process
+before anything else is accepted
+"""
+
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import struct
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+Handler = Callable[[Any], Awaitable[Any]]
+
+# the length of the json that follows, big endian
+HEADER = struct.Struct(">I")
+
+# seconds between attempts to reconnect to the launcher, doubled up to the max
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+_log = logging.getLogger(__name__)
+
+
+class IPCError(Exception):
+    pass
+
+
+async def _send(writer: asyncio.StreamWriter, **payload: Any) -> None:
+    data = json.dumps(payload).encode()
+    writer.write(HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Optional[dict]:
+    """the next message, None once the connection is closed
+
+    a message that isn't valid json is logged and skipped, the length prefix
+    keeps the stream in sync either way
+    """
+
+    while True:
+        try:
+            header = await reader.readexactly(HEADER.size)
+            frame = await reader.readexactly(HEADER.unpack(header)[0])
+        except asyncio.IncompleteReadError:
+            return None
+
+        try:
+            message = json.loads(frame)
+        except ValueError as exc:
+            _log.warning(f"Skipped an ipc message that isn't valid json: {exc}")
+            continue
+        if not isinstance(message, dict):
+            _log.warning(f"Skipped an ipc message that isn't an object: {type(message).__name__}")
+            continue
+        return message
+
+
+def _spawn(tasks: set[asyncio.Task], coro: Awaitable[Any]) -> None:
+    # the loop only keeps weak references to tasks
+    task = asyncio.ensure_future(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+class IPCServer:
+    """runs in the launcher, hands out identify slots and fans requests out
+    to every connected cluster"""
+
+    def __init__(
+        self,
+        *,
+        port: int,
+        secret: str,
+        max_concurrency: int = 1,
+        identify_delay: float = 5.0,
+        timeout: float = 10.0,
+    ) -> None:
+        self.port = port
+        self.secret = secret
+        self.max_concurrency = max_concurrency
+        self.identify_delay = identify_delay
+        self.timeout = timeout
+
+        self.clusters: dict[int, asyncio.StreamWriter] = {}
+        self.server: Optional[asyncio.AbstractServer] = None
+
+        self._nonces = itertools.count()
+        self._pending: dict[int, asyncio.Future] = {}
+        self._identify_locks: dict[int, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self._on_connection, "127.0.0.1", self.port)
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.clusters.values()):
+            writer.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        cluster_id = None
+        try:
+            hello = await _receive(reader)
+            if hello is None or hello.get("op") != "hello" or not hmac.compare_digest(
+                str(hello.get("secret")), self.secret
+            ):
+                _log.warning("Rejected an unauthenticated ipc connection")
+                return
+
+            cluster_id = int(hello["cluster_id"])
+            self.clusters[cluster_id] = writer
+            _log.info(f"Cluster {cluster_id} connected to ipc")
+
+            while (message := await _receive(reader)) is not None:
+                _spawn(self._tasks, self._handle(cluster_id, writer, message))
+        except (ConnectionError, KeyError, ValueError):
+            pass
+        finally:
+            if cluster_id is not None and self.clusters.get(cluster_id) is writer:
+                del self.clusters[cluster_id]
+                _log.info(f"Cluster {cluster_id} disconnected from ipc")
+            writer.close()
+
+    async def _handle(self, cluster_id: int, writer: asyncio.StreamWriter, message: dict) -> None:
+        op = message.get("op")
+
+        if op == "response":
+            future = self._pending.pop(message.get("nonce"), None) # type: ignore
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+
+        try:
+            if op == "identify":
+                await self._wait_for_identify(int(message["shard_id"]))
+                data = None
+            elif op == "broadcast":
+                data = await self.broadcast(message["handler"], message.get("payload"))
+            else:
+                return
+        except (KeyError, TypeError, ValueError) as exc:
+            _log.warning(f"Ignored a malformed {op} message from cluster {cluster_id}: {exc!r}")
+            return
+
+        try:
+            await _send(writer, op="response", nonce=message.get("nonce"), data=data)
+        except ConnectionError:
+            pass
+
+    async def _wait_for_identify(self, shard_id: int) -> None:
+        # discord allows max_concurrency identifies per 5 seconds, bucketed by shard id
+        bucket = shard_id % self.max_concurrency
+        lock = self._identify_locks.setdefault(bucket, asyncio.Lock())
+        await lock.acquire()
+        asyncio.get_running_loop().call_later(self.identify_delay, lock.release)
+
+    async def _request(self, cluster_id: int, writer: asyncio.StreamWriter, handler: str, payload: Any) -> dict:
+        nonce = next(self._nonces)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[nonce] = future
+        try:
+            await _send(writer, op="request", nonce=nonce, handler=handler, payload=payload)
+            message = await asyncio.wait_for(future, timeout=self.timeout)
+        except (ConnectionError, asyncio.TimeoutError) as exc:
+            return {"cluster_id": cluster_id, "error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            self._pending.pop(nonce, None)
+
+        result = {"cluster_id": cluster_id}
+        if "error" in message:
+            result["error"] = message["error"]
+        else:
+            result["data"] = message.get("data")
+        return result
+
+    async def broadcast(self, handler: str, payload: Any = None) -> list[dict]:
+        results = await asyncio.gather(
+            *(
+                self._request(cluster_id, writer, handler, payload)
+                for cluster_id, writer in sorted(self.clusters.items())
+            )
+        )
+        return list(results)
+
+
+class IPCClient:
+    """runs inside every cluster process and talks to the launcher"""
+
+    def __init__(
+        self,
+        *,
+        cluster_id: int,
+        port: int,
+        secret: str,
+        timeout: float = 30.0,
+        identify_timeout: float = 300.0,
+    ) -> None:
+        self.cluster_id = cluster_id
+        self.port = port
+        self.secret = secret
+        self.timeout = timeout
+        # shards of every cluster queue for the same identify slots, so this is generous
+        self.identify_timeout = identify_timeout
+
+        self.handlers: dict[str, Handler] = {}
+
+        self._nonces = itertools.count()
+        self._pending: dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def add_handler(self, name: str, handler: Handler) -> None:
+        self.handlers[name] = handler
+
+    def remove_handler(self, name: str) -> None:
+        self.handlers.pop(name, None)
+
+    async def _open(self) -> asyncio.StreamReader:
+        reader, self._writer = await asyncio.open_connection("127.0.0.1", self.port)
+        await _send(self._writer, op="hello", cluster_id=self.cluster_id, secret=self.secret)
+        return reader
+
+    async def connect(self) -> None:
+        reader = await self._open()
+        self._task = asyncio.create_task(self._run(reader))
+
+    async def close(self) -> None:
+        tasks = [task for task in (self._task, *self._tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, reader: asyncio.StreamReader) -> None:
+        delay = RECONNECT_DELAY
+        while True:
+            connected = time.monotonic()
+            try:
+                await self._read(reader)
+            except ConnectionError:
+                pass
+
+            self._disconnected()
+            # a connection that dropped right away doesn't reset the backoff
+            if time.monotonic() - connected > MAX_RECONNECT_DELAY:
+                delay = RECONNECT_DELAY
+
+            _log.warning(f"Lost the connection to the launcher, reconnecting in {delay:.0f}s")
+            while True:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                try:
+                    reader = await self._open()
+                except OSError as exc:
+                    _log.warning(f"Failed to reconnect to the launcher, retrying in {delay:.0f}s: {exc}")
+                    continue
+                _log.info("Reconnected to the launcher")
+                break
+
+    def _disconnected(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(IPCError("lost connection to the launcher"))
+        self._pending.clear()
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while (message := await _receive(reader)) is not None:
+            if message.get("op") == "request":
+                _spawn(self._tasks, self._dispatch(message))
+            elif message.get("op") == "response":
+                future = self._pending.pop(message.get("nonce"), None) # type: ignore
+                if future is not None and not future.done():
+                    future.set_result(message.get("data"))
+
+    async def _dispatch(self, message: dict) -> None:
+        name = message.get("handler")
+        handler = self.handlers.get(name) # type: ignore
+        response: dict[str, Any] = {"op": "response", "nonce": message.get("nonce")}
+
+        if handler is None:
+            response["error"] = f'no handler named "{name}"'
+        else:
+            try:
+                response["data"] = await handler(message.get("payload"))
+            except Exception as exc:
+                response["error"] = f"{type(exc).__name__}: {exc}"
+
+        writer = self._writer
+        if writer is None:
+            return
+        try:
+            await _send(writer, **response)
+        except (TypeError, ValueError) as exc:
+            # the handler returned something json can't hold
+            await _send(writer, op="response", nonce=response["nonce"], error=f"{type(exc).__name__}: {exc}")
+        except ConnectionError:
+            pass
+
+    async def _call(self, op: str, **payload: Any) -> Any:
+        if self._writer is None:
+            raise IPCError("not connected to the launcher")
+
+        nonce = next(self._nonces)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[nonce] = future
+        try:
+            await _send(self._writer, op=op, nonce=nonce, **payload)
+            return await future
+        finally:
+            self._pending.pop(nonce, None)
+
+    async def wait_for_identify(self, shard_id: int) -> None:
+        await asyncio.wait_for(self._call("identify", shard_id=shard_id), timeout=self.identify_timeout)
+
+    async def broadcast(self, handler: str, payload: Any = None) -> list[dict]:
+        """runs ``handler`` on every cluster, this one included
+
+        returns one ``{"cluster_id": ..., "data": ...}`` dict per cluster,
+        with ``error`` instead of ``data`` if that cluster failed
+        """
+
+        return await asyncio.wait_for(
+            self._call("broadcast", handler=handler, payload=payload), timeout=self.timeout
+        )
@@ -0,0 +1,143 @@
+"""logging that stays off the event loop
+
+log calls only put the record on a queue, formatting and writing happens
+on the thread of a :class:`logging.handlers.QueueListener`. debug records
+from noisy loggers can be sampled before they're even queued.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import discord
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# attributes every record has, anything else was passed with extra=
+RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                data[key] = value
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """keeps one in every ``1 / rate`` records below info from the configured
+    loggers and their children, info and above always goes through"""
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        # (logger name, keep every nth record)
+        self.every = {name: max(1, round(1 / rate)) for name, rate in rates.items() if rate > 0}
+        self.dropped_entirely = {name for name, rate in rates.items() if rate <= 0}
+        self.counts: dict[str, int] = {}
+        self.sampled = 0
+        self._lock = threading.Lock()
+
+    def _match(self, name: str) -> Optional[str]:
+        while name:
+            if name in self.every or name in self.dropped_entirely:
+                return name
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # info carries state changes like connects and resumes, only debug chatter is sampled
+        if record.levelno >= logging.INFO:
+            return True
+
+        name = self._match(record.name)
+        if name is None:
+            return True
+        if name in self.dropped_entirely:
+            self.sampled += 1
+            return False
+
+        # records can come from executor threads too
+        with self._lock:
+            count = self.counts.get(name, 0)
+            self.counts[name] = count + 1
+        if count % self.every[name] == 0:
+            return True
+
+        self.sampled += 1
+        return False
+
+
+class LoopQueueHandler(logging.handlers.QueueHandler):
+    """does as little as possible on the calling thread, the message is merged
+    with its arguments so later changes to them don't show up, but exceptions
+    are only formatted by the listener"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def create_formatter(options: dict[str, Any], stream: Any = None) -> logging.Formatter:
+    if options.get("json"):
+        return JSONFormatter()
+    if stream is not None and discord.utils.stream_supports_colour(stream):
+        return discord.utils._ColourFormatter()
+    return logging.Formatter("[{asctime}] [{levelname:<8}] {name}: {message}", DATE_FORMAT, style="{")
+
+
+def setup_logging(options: Optional[dict[str, Any]] = None) -> logging.handlers.QueueListener:
+    """routes every log record through a queue to a background thread and
+    returns the started listener, stop it to flush what's left on exit"""
+
+    options = options or {}
+
+    handlers: list[logging.Handler] = []
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(create_formatter(options, sys.stdout))
+    handlers.append(stream)
+
+    path = options.get("file")
+    if path:
+        rotating = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=options.get("max_bytes", 10 * 1024 * 1024),
+            backupCount=options.get("backup_count", 5),
+            encoding="utf-8",
+        )
+        # colours don't belong in files
+        rotating.setFormatter(create_formatter(options))
+        handlers.append(rotating)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = LoopQueueHandler(log_queue)
+    sample = options.get("sample") or {}
+    if sample:
+        handler.addFilter(SamplingFilter(sample))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(options.get("level", "INFO").upper())
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,151 @@
+"""where the bot's memory goes
+
+:class:`MemoryTracer` wraps tracemalloc so the allocations made since
+tracing started can be grouped by file and line, :func:`cache_sizes`
+counts what discord.py and the bot itself hold on to
+"""
+
+import os
+import resource
+import sysconfig
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from .errors import ROOT
+
+if TYPE_CHECKING:
+    from .bot import Amyrin
+
+STDLIB = sysconfig.get_paths()["stdlib"]
+
+# allocations of tracemalloc itself and of the import system are noise in every diff
+IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def short_path(filename: str) -> str:
+    if filename.startswith(ROOT):
+        return filename[len(ROOT) + 1 :]
+    _, site, rest = filename.partition("site-packages" + os.sep)
+    if site:
+        return rest
+    if filename.startswith(STDLIB):
+        return filename[len(STDLIB) + 1 :]
+    return filename
+
+
+def format_size(size: float, signed: bool = False) -> str:
+    sign = "+" if signed else ""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:{sign}.0f} {unit}" if unit == "B" else f"{size:{sign}.1f} {unit}"
+        size /= 1024
+    return f"{size:{sign}.2f} GiB"
+
+
+def current_rss() -> Optional[int]:
+    """resident memory in bytes, only known on linux"""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss() -> int:
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class AllocationDiff:
+    location: str
+    size: int
+    size_diff: int
+    count: int
+    count_diff: int
+
+
+class MemoryTracer:
+    def __init__(self) -> None:
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at: Optional[float] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """starts tracing and takes the baseline later diffs compare against,
+        more frames group allocations better but cost more memory"""
+
+        if not self.tracing:
+            tracemalloc.start(frames)
+        self.started_at = time.monotonic()
+        self.baseline = self.take_snapshot()
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self.baseline = None
+        self.started_at = None
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(IGNORED)
+
+    def diff(self, group_by: str = "lineno") -> list[AllocationDiff]:
+        """what changed since the baseline, biggest growth first
+
+        blocks for a while with a lot of traced allocations, run it in a thread
+        """
+
+        if self.baseline is None:
+            raise RuntimeError("tracing hasn't been started")
+
+        snapshot = self.take_snapshot()
+        diffs = []
+        for stat in snapshot.compare_to(self.baseline, group_by):
+            frame = stat.traceback[0]
+            where = short_path(frame.filename)
+            if group_by != "filename":
+                where = f"{where}:{frame.lineno}"
+            diffs.append(AllocationDiff(where, stat.size, stat.size_diff, stat.count, stat.count_diff))
+        return diffs
+
+    def traced(self) -> tuple[int, int, int]:
+        """currently traced bytes, the peak and what tracemalloc itself uses"""
+
+        current, peak = tracemalloc.get_traced_memory()
+        return current, peak, tracemalloc.get_tracemalloc_memory()
+
+
+def cache_sizes(bot: "Amyrin") -> dict[str, int]:
+    """number of entries in discord.py's caches and the bot's own ones"""
+
+    state = bot._connection
+    return {
+        "guilds": len(state._guilds),
+        "members": sum(len(guild._members) for guild in state._guilds.values()),
+        "users": len(state._users),
+        "messages": len(state._messages) if state._messages is not None else 0,
+        "private channels": len(state._private_channels),
+        "emojis": len(state._emojis),
+        "stickers": len(state._stickers),
+        "views": len(state._view_store._views),
+        "cogs": len(bot.cogs),
+        "extensions": len(bot.extensions),
+        "commands": len(bot.all_commands),
+        "guild prefixes": len(bot.prefixes.guilds),
+        "user prefixes": len(bot.prefixes.users),
+        "error fingerprints": len(bot.error_store.entries),
+        "command stats": len(bot.metrics.commands),
+        "recent invocations": len(bot.metrics.recent),
+        "send channels": len(bot.sender.channels),
+        "queued sends": bot.sender.queue_depth,
+    }
@@ -0,0 +1,142 @@
+"""per command latency, error and throughput numbers kept in fixed memory
+
+every command gets a histogram with fixed buckets instead of a list of
+samples, and the most recent invocations are kept in a ring buffer for
+throughput, so memory use doesn't grow with uptime
+"""
+
+import bisect
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, NamedTuple
+
+from discord.ext import commands
+
+# upper bounds of the histogram buckets in seconds, the last bucket is unbounded
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """upper bound of the bucket the percentile falls in"""
+
+        if not self.count:
+            return 0.0
+
+        target = pct / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return self.max
+
+
+@dataclass
+class CommandStats:
+    invocations: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+    send: Histogram = field(default_factory=Histogram)
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.invocations if self.invocations else 0.0
+
+
+class Sample(NamedTuple):
+    finished: float
+    command: str
+    latency: float
+    failed: bool
+
+
+class AmyrinContext(commands.Context):
+    """keeps track of how long the invocation spent sending messages"""
+
+    send_time: float = 0.0
+
+    async def send(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().send(*args, **kwargs)
+        finally:
+            self.send_time += time.perf_counter() - start
+
+
+class CommandMetrics:
+    def __init__(self, ring_size: int = 4096) -> None:
+        self.commands: dict[str, CommandStats] = {}
+        self.recent: deque[Sample] = deque(maxlen=ring_size)
+        self.started = time.monotonic()
+
+    def resize(self, ring_size: int) -> None:
+        self.recent = deque(self.recent, maxlen=ring_size)
+
+    def get(self, name: str) -> CommandStats:
+        stats = self.commands.get(name)
+        if stats is None:
+            stats = self.commands[name] = CommandStats()
+        return stats
+
+    @asynccontextmanager
+    async def track(self, ctx: commands.Context) -> AsyncIterator[None]:
+        if ctx.command is None:
+            yield
+            return
+
+        name = ctx.command.qualified_name
+        stats = self.get(name)
+        stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            latency = time.perf_counter() - start
+            failed = ctx.command_failed
+
+            stats.in_flight -= 1
+            stats.invocations += 1
+            stats.errors += failed
+            stats.latency.observe(latency)
+            stats.send.observe(getattr(ctx, "send_time", 0.0))
+            self.recent.append(Sample(time.monotonic(), name, latency, failed))
+
+    def throughput(self, window: float = 60.0, command: str | None = None) -> float:
+        """invocations per second over the last ``window`` seconds"""
+
+        cutoff = time.monotonic() - window
+        count = 0
+        for sample in reversed(self.recent):
+            if sample.finished < cutoff:
+                break
+            if command is None or sample.command == command:
+                count += 1
+
+        window = min(window, time.monotonic() - self.started) or 1.0
+        return count / window
+
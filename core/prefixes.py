@@ -0,0 +1,141 @@
+"""per guild and per user prefixes
+
+everything is read from sqlite once at startup into plain dicts, so
+resolving the prefixes of a message is two dict lookups, changes update the
+dicts right away and are written to the database in the background
+"""
+
+import asyncio
+import logging
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+import discord
+
+if TYPE_CHECKING:
+    from .bot import Amyrin
+
+DEFAULT_PREFIX = "a!"
+
+# long enough for anything sensible, short enough to not be abused
+MAX_PREFIX_LENGTH = 16
+
+_log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prefixes (
+    scope TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    prefix TEXT NOT NULL,
+    PRIMARY KEY (scope, id)
+)
+"""
+
+
+class PrefixStore:
+    def __init__(self, config: Optional[dict[str, Any]] = None) -> None:
+        config = config or {}
+        self.default: str = config.get("default", DEFAULT_PREFIX)
+        self.path = Path(config.get("database", "amyrin.db"))
+
+        self.guilds: dict[int, str] = {}
+        self.users: dict[int, str] = {}
+
+        self._db: Optional[sqlite3.Connection] = None
+        # (scope, id, prefix or None to delete), drained by one writer so writes stay in order.
+        # a None instead of a change tells the writer to stop once everything before it is written
+        self._pending: asyncio.Queue[Optional[tuple[str, int, Optional[str]]]] = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+
+    def _connect(self) -> dict[str, dict[int, str]]:
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+        loaded: dict[str, dict[int, str]] = {"guild": {}, "user": {}}
+        for scope, id, prefix in self._db.execute("SELECT scope, id, prefix FROM prefixes"):
+            loaded.setdefault(scope, {})[id] = prefix
+        return loaded
+
+    async def load(self) -> None:
+        loaded = await asyncio.to_thread(self._connect)
+        # anything set before loading finished is newer than what's in the database
+        self.guilds = {**loaded["guild"], **self.guilds}
+        self.users = {**loaded["user"], **self.users}
+        self._writer = asyncio.create_task(self._write_forever())
+        _log.info(f"Loaded {len(self.guilds)} guild and {len(self.users)} user prefixes from {self.path}")
+
+    def _write(self, batch: list[tuple[str, int, Optional[str]]]) -> None:
+        assert self._db is not None
+        with self._db:
+            for scope, id, prefix in batch:
+                if prefix is None:
+                    self._db.execute("DELETE FROM prefixes WHERE scope = ? AND id = ?", (scope, id))
+                else:
+                    self._db.execute(
+                        "INSERT INTO prefixes (scope, id, prefix) VALUES (?, ?, ?) "
+                        "ON CONFLICT (scope, id) DO UPDATE SET prefix = excluded.prefix",
+                        (scope, id, prefix),
+                    )
+
+    def _take_batch(self) -> list[Optional[tuple[str, int, Optional[str]]]]:
+        batch = []
+        while not self._pending.empty():
+            batch.append(self._pending.get_nowait())
+        return batch
+
+    async def _write_forever(self) -> None:
+        while True:
+            batch = [await self._pending.get()]
+            batch += self._take_batch()
+            changes = [change for change in batch if change is not None]
+            if changes:
+                try:
+                    await asyncio.to_thread(self._write, changes)
+                except Exception:
+                    _log.exception(f"Failed to write {len(changes)} prefix change(s) to {self.path}")
+            if None in batch:
+                return
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            # cancelling wouldn't stop a write already running in its thread, so let it finish
+            self._pending.put_nowait(None)
+            await self._writer
+            self._writer = None
+
+        if self._db is not None:
+            # changes made before the writer started, or after it stopped
+            batch = [change for change in self._take_batch() if change is not None]
+            if batch:
+                await asyncio.to_thread(self._write, batch)
+            self._db.close()
+            self._db = None
+
+    def _set(self, scope: str, store: dict[int, str], id: int, prefix: Optional[str]) -> None:
+        if prefix is None:
+            store.pop(id, None)
+        else:
+            store[id] = prefix
+        self._pending.put_nowait((scope, id, prefix))
+
+    def set_guild(self, guild_id: int, prefix: Optional[str]) -> None:
+        self._set("guild", self.guilds, guild_id, prefix)
+
+    def set_user(self, user_id: int, prefix: Optional[str]) -> None:
+        self._set("user", self.users, user_id, prefix)
+
+    def resolve(self, user_id: int, guild_id: Optional[int]) -> list[str]:
+        """prefixes that work for this user in this guild, longest first so a
+        prefix that starts with another one still wins"""
+
+        guild = self.guilds.get(guild_id, self.default) if guild_id is not None else self.default
+        user = self.users.get(user_id)
+        if user is None or user == guild:
+            return [guild]
+        return [user, guild] if len(user) >= len(guild) else [guild, user]
+
+
+def get_prefix(bot: "Amyrin", message: discord.Message) -> list[str]:
+    return bot.prefixes.resolve(message.author.id, message.guild.id if message.guild else None)
@@ -0,0 +1,271 @@
+"""reloads only the extensions affected by a set of changed files
+
+local modules are mapped to the files they come from and their imports are
+read from the source, so a change to a module also reloads every extension
+that (indirectly) imports it. everything is reloaded in dependency order
+and if anything fails all of it is rolled back.
+
+the running bot holds objects from ``core.bot`` and everything it imports,
+re-importing any of those would leave the bot on the old copy while the
+extensions get the new one, so changes to them only report a restart.
+"""
+
+import ast
+import importlib
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from .bot import Amyrin
+
+PACKAGES = ("core", "exts", "utils")
+
+# the running bot instance was built from this and everything it imports
+BOT_MODULE = "core.bot"
+
+
+def module_name(path: str | Path) -> str | None:
+    path = Path(path)
+    if path.suffix != ".py" or not path.parts or path.parts[0] not in PACKAGES:
+        return None
+
+    parts = list(path.with_suffix("").parts)
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def _resolve(name: str, module: str, is_package: bool, level: int) -> str:
+    if not level:
+        return name
+
+    base = module.split(".")
+    if not is_package:
+        base.pop()
+    if level > 1:
+        base = base[: -(level - 1)]
+    return ".".join(base + ([name] if name else []))
+
+
+def local_imports(path: Path, module: str) -> set[str]:
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    is_package = path.name == "__init__.py"
+
+    found: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            found.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = _resolve(node.module or "", module, is_package, node.level)
+            found.add(base)
+            # ``from utils import executor`` can import a submodule
+            found.update(f"{base}.{alias.name}" for alias in node.names)
+
+    return found
+
+
+def dependency_graph(root: Path = Path(".")) -> dict[str, set[str]]:
+    """maps every local module to the local modules it imports"""
+
+    files = {
+        name: file
+        for package in PACKAGES
+        for file in (root / package).rglob("*.py")
+        if (name := module_name(file.relative_to(root))) is not None
+    }
+
+    graph: dict[str, set[str]] = {}
+    for name, file in files.items():
+        try:
+            imports = local_imports(file, name)
+        except SyntaxError:
+            imports = set()
+        # importing a module runs the __init__ of every package above it first
+        for imported in imports | {name}:
+            parts = imported.split(".")
+            imports |= {".".join(parts[:end]) for end in range(1, len(parts))}
+        graph[name] = {i for i in imports if i in files and i != name}
+    return graph
+
+
+def imported_by(name: str, graph: dict[str, set[str]]) -> set[str]:
+    """``name`` and every local module it imports, directly or not"""
+
+    found = {name}
+    stack = [name]
+    while stack:
+        for dep in graph.get(stack.pop(), ()):
+            if dep not in found:
+                found.add(dep)
+                stack.append(dep)
+    return found
+
+
+def topological_order(modules: Iterable[str], graph: dict[str, set[str]]) -> list[str]:
+    modules = set(modules)
+    order: list[str] = []
+    seen: set[str] = set()
+
+    def visit(name: str) -> None:
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in sorted(graph.get(name, ())):
+            if dep in modules:
+                visit(dep)
+        order.append(name)
+
+    for name in sorted(modules):
+        visit(name)
+    return order
+
+
+@dataclass
+class ReloadPlan:
+    modules: list[str] = field(default_factory=list)
+    reload: list[str] = field(default_factory=list)
+    load: list[str] = field(default_factory=list)
+    unload: list[str] = field(default_factory=list)
+    restart_required: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.modules or self.reload or self.load or self.unload)
+
+
+@dataclass
+class ReloadResult:
+    timings: list[tuple[str, str, float]] = field(default_factory=list)
+    error: BaseException | None = None
+    failed: str | None = None
+    restart_required: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Reloader:
+    def __init__(self, bot: "Amyrin", root: Path = Path(".")) -> None:
+        self.bot = bot
+        self.root = root
+
+    def plan(self, changes: Iterable[tuple[str, str]]) -> ReloadPlan:
+        """``changes`` is an iterable of ``(change_type, path)`` like git's name-status"""
+
+        graph = dependency_graph(self.root)
+        barriers = imported_by(BOT_MODULE, graph)
+        dependents: dict[str, set[str]] = {}
+        for name, deps in graph.items():
+            for dep in deps:
+                dependents.setdefault(dep, set()).add(name)
+
+        plan = ReloadPlan()
+        dirty: set[str] = set()
+
+        for change_type, path in changes:
+            name = module_name(path)
+            if name is None:
+                continue
+
+            if name in barriers:
+                plan.restart_required.append(name)
+            elif name.startswith("exts.") and change_type == "A":
+                plan.load.append(name)
+            elif name.startswith("exts.") and change_type == "D":
+                if name in self.bot.extensions:
+                    plan.unload.append(name)
+            elif change_type != "D":
+                dirty.add(name)
+
+        stack = list(dirty)
+        while stack:
+            for dependent in dependents.get(stack.pop(), ()):
+                if dependent not in dirty and dependent not in barriers:
+                    dirty.add(dependent)
+                    stack.append(dependent)
+
+        for name in topological_order(dirty, graph):
+            if name in self.bot.extensions:
+                plan.reload.append(name)
+            elif name in sys.modules and not name.startswith("exts."):
+                plan.modules.append(name)
+
+        return plan
+
+    async def apply(self, plan: ReloadPlan) -> ReloadResult:
+        bot = self.bot
+        result = ReloadResult(restart_required=plan.restart_required)
+
+        old_modules = {name: sys.modules[name] for name in plan.modules + plan.reload + plan.unload}
+        done: list[tuple[str, str]] = []
+
+        steps = (
+            [("unload", name) for name in plan.unload]
+            + [("module", name) for name in plan.modules]
+            + [("reload", name) for name in plan.reload]
+            + [("load", name) for name in plan.load]
+        )
+
+        for action, name in steps:
+            start = time.perf_counter()
+            try:
+                if action == "unload":
+                    await bot.unload_extension(name)
+                elif action == "module":
+                    self._reimport(name)
+                elif action == "reload":
+                    await bot.reload_extension(name)
+                else:
+                    await bot.load_extension(name)
+            except Exception as exc:
+                result.error, result.failed = exc, name
+                await self._rollback(done, old_modules)
+                return result
+
+            done.append((action, name))
+            result.timings.append((action, name, time.perf_counter() - start))
+
+        return result
+
+    def _reimport(self, name: str) -> None:
+        old = sys.modules.pop(name)
+        try:
+            module = importlib.import_module(name)
+        except BaseException:
+            self._restore(name, old)
+            raise
+        self._set_parent_attr(name, module)
+
+    def _restore(self, name: str, module: ModuleType) -> None:
+        sys.modules[name] = module
+        self._set_parent_attr(name, module)
+
+    def _set_parent_attr(self, name: str, module: ModuleType) -> None:
+        parent, _, child = name.rpartition(".")
+        if parent and parent in sys.modules:
+            setattr(sys.modules[parent], child, module)
+
+    async def _rollback(self, done: list[tuple[str, str]], old_modules: dict[str, ModuleType]) -> None:
+        bot = self.bot
+
+        for action, name in reversed(done):
+            if action == "module":
+                self._restore(name, old_modules[name])
+            elif action == "load":
+                await bot.unload_extension(name)
+            elif action == "reload":
+                await bot.unload_extension(name)
+                await self._restore_extension(name, old_modules[name])
+            elif action == "unload":
+                await self._restore_extension(name, old_modules[name])
+
+    async def _restore_extension(self, name: str, lib: ModuleType) -> None:
+        # same as what reload_extension does to roll back a failed reload
+        self._restore(name, lib)
+        await lib.setup(self.bot)
+        self.bot._BotBase__extensions[name] = lib  # type: ignore
+        self.bot.extension_generation += 1
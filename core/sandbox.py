@@ -0,0 +1,209 @@
+"""runs code in a separate, long lived worker process
+
+the worker has a memory limit for its whole life and a cpu time limit per
+job, the parent enforces a wall clock timeout and kills the worker when a
+job times out or gets cancelled, a new one is started for the next job.
+what a job emits is streamed back as ``(kind, text)`` pairs while it runs.
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import resource
+import signal
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+_log = logging.getLogger(__name__)
+
+# an async function taking the code and an emit(kind, text) callback
+Runner = Callable[[str, Callable[[str, str], None]], Awaitable[None]]
+
+
+class CPULimitExceeded(Exception):
+    pass
+
+
+class SandboxError(Exception):
+    """the worker died or ran out of time, it will be replaced for the next job"""
+
+
+@dataclass
+class SandboxLimits:
+    timeout: float = 30.0
+    cpu_time: int = 20
+    memory: int = 512 * 1024 * 1024
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "SandboxLimits":
+        unknown = set(config) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise TypeError(f'sandbox key in config contains unknown keys: {", ".join(unknown)}')
+        limits = cls(**config)
+        for key, value in vars(limits).items():
+            if not isinstance(value, (int, float)) or value <= 0:
+                raise TypeError(f"sandbox.{key} key in config needs to be a positive number")
+        return limits
+
+
+def _on_cpu_limit(signum, frame) -> None:
+    raise CPULimitExceeded("the job used up its cpu time")
+
+
+def _worker_main(conn: Connection, runner_path: str, memory: int) -> None:
+    # a module level function so the spawn start method can find it
+    module, _, name = runner_path.partition(":")
+    runner: Runner = getattr(importlib.import_module(module), name)
+
+    # only after importing, the imports alone take a good chunk of address space
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    # SIGXCPU kills the process by default, raising keeps the worker alive
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    # ctrl+c in the terminal is for the bot, not for the worker
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def emit(kind: str, text: str) -> None:
+        conn.send((kind, text))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        code, cpu_time = job
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime) + 1
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_time, hard))
+
+        try:
+            asyncio.run(runner(code, emit))
+        except BaseException as exc:
+            emit("error", f"{type(exc).__name__}: {exc}")
+        finally:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+            conn.send(("done", ""))
+
+
+class Sandbox:
+    def __init__(self, runner: str, limits: Optional[SandboxLimits] = None) -> None:
+        """``runner`` is the ``module:function`` of a :data:`Runner`, it is imported in the worker"""
+
+        self.runner = runner
+        self.limits = limits or SandboxLimits()
+
+        self.process: Optional[BaseProcess] = None
+        self.jobs = 0
+        self.restarts = 0
+
+        self._conn: Optional[Connection] = None
+        self._messages: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+        self._context = multiprocessing.get_context("spawn")
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def _start(self) -> None:
+        parent, child = self._context.Pipe()
+        self.process = self._context.Process(
+            target=_worker_main,
+            args=(child, self.runner, self.limits.memory),
+            name="amyrin-sandbox",
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+        self._conn = parent
+        self._messages = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        loop.add_reader(parent.fileno(), self._on_readable, parent, self._messages)
+        _log.info(f"Started sandbox worker (pid {self.process.pid})")
+
+    def _on_readable(self, conn: Connection, messages: asyncio.Queue) -> None:
+        try:
+            messages.put_nowait(conn.recv())
+        except (EOFError, OSError):
+            asyncio.get_running_loop().remove_reader(conn.fileno())
+            messages.put_nowait(None)
+
+    def kill(self) -> None:
+        if self._conn is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._conn.fileno())
+            except (OSError, ValueError):
+                pass
+            self._conn.close()
+            self._conn = None
+
+        if self.process is not None:
+            self.process.kill()
+            self.process.join(1)
+            self.process.close()
+            self.process = None
+
+    async def run(self, code: str) -> AsyncIterator[tuple[str, str]]:
+        """runs ``code`` in the worker and yields what it emits until it is done"""
+
+        async with self._lock:
+            if self.process is None or not self.process.is_alive():
+                if self.process is not None:
+                    self.kill()
+                self._start()
+
+            assert self._conn is not None and self._messages is not None
+            self._conn.send((code, self.limits.cpu_time))
+            self.jobs += 1
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.limits.timeout
+            finished = False
+            try:
+                while True:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise SandboxError(f"timed out after {self.limits.timeout}s")
+
+                    try:
+                        message = await asyncio.wait_for(self._messages.get(), remaining)
+                    except asyncio.TimeoutError:
+                        raise SandboxError(f"timed out after {self.limits.timeout}s") from None
+
+                    if message is None:
+                        exitcode = None
+                        if self.process is not None:
+                            # it's already gone, this doesn't wait
+                            self.process.join(1)
+                            exitcode = self.process.exitcode
+                        raise SandboxError(f"the worker exited with code {exitcode}")
+
+                    kind, text = message
+                    if kind == "done":
+                        finished = True
+                        return
+                    yield kind, text
+            finally:
+                # timed out, cancelled or died halfway, the worker can't be trusted to be idle
+                if not finished:
+                    self.kill()
+                    self.restarts += 1
+
+    async def close(self) -> None:
+        if self.process is None:
+            return
+
+        if self._conn is not None and not self.busy:
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            await asyncio.to_thread(self.process.join, 2)
+        self.kill()
@@ -0,0 +1,263 @@
+"""queues outgoing messages so the bot stays under discord's rate limits
+instead of running into them and backing off after a 429
+
+every channel gets a token bucket and a priority queue, and all of them
+share one global bucket, which is split evenly between clusters. owner
+invocations go first, and when a channel backs up, low priority messages
+are merged into the one queued before them or dropped. interaction
+responses don't go through here, they use their own webhook limits.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+import discord
+from discord.http import MultipartParameters
+
+# discord allows 2000 characters per message
+MAX_CONTENT = 2000
+
+# payload keys a message can have and still be merged with another one
+MERGEABLE_KEYS = {"content", "allowed_mentions", "tts"}
+
+_log = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# set for the duration of a command, so every send it makes inherits it
+send_priority: ContextVar[Priority] = ContextVar("send_priority", default=Priority.NORMAL)
+
+
+@contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    token = send_priority.set(value)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+
+class SendDropped(discord.ClientException):
+    """a low priority message was dropped because its channel was backed up"""
+
+
+class TokenBucket:
+    __slots__ = ("rate", "per", "tokens", "updated")
+
+    def __init__(self, rate: int, per: float) -> None:
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """seconds until a token is free, 0 if one is free now"""
+
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) * self.per / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    params: MultipartParameters = field(compare=False)
+    futures: list[asyncio.Future] = field(compare=False, default_factory=list)
+
+    @property
+    def mergeable(self) -> bool:
+        payload = self.params.payload
+        return (
+            self.priority == Priority.LOW
+            and not self.params.files
+            and payload is not None
+            and isinstance(payload.get("content"), str)
+            and not payload.get("tts")
+            and payload.keys() <= MERGEABLE_KEYS
+        )
+
+    def merge(self, other: "_Job") -> bool:
+        """appends ``other``'s content to this message if both are plain text that fits"""
+
+        if not (self.mergeable and other.mergeable):
+            return False
+
+        ours, theirs = self.params.payload, other.params.payload
+        if ours.get("allowed_mentions") != theirs.get("allowed_mentions"): # type: ignore
+            return False
+
+        content = f"{ours['content']}\n{theirs['content']}" # type: ignore
+        if len(content) > MAX_CONTENT:
+            return False
+
+        ours["content"] = content # type: ignore
+        self.futures.extend(other.futures)
+        return True
+
+
+class _Channel:
+    __slots__ = ("bucket", "jobs", "worker", "wakeup")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+        self.jobs: list[_Job] = []
+        self.worker: Optional[asyncio.Task] = None
+        self.wakeup = asyncio.Event()
+
+
+@dataclass
+class SenderStats:
+    sent: int = 0
+    merged: int = 0
+    dropped: int = 0
+    failed: int = 0
+    waits: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.waits if self.waits else 0.0
+
+
+class SendScheduler:
+    def __init__(
+        self,
+        send: Callable[..., Awaitable[Any]],
+        config: Optional[dict[str, Any]] = None,
+        *,
+        clusters: int = 1,
+    ) -> None:
+        config = config or {}
+        self._send = send
+        self.channel_rate: int = config.get("channel_rate", 5)
+        self.channel_per: float = config.get("channel_per", 5.0)
+        # discord's global limit is 50/s for every request, leave room for everything else.
+        # the limit is per token, so every cluster process gets its share of it
+        self.global_bucket = TokenBucket(max(1, config.get("global_rate", 40) // clusters), 1.0)
+        # channels with more queued messages than this start merging and dropping low priority ones
+        self.max_queue: int = config.get("max_queue", 10)
+
+        self.channels: dict[int, _Channel] = {}
+        self.stats = SenderStats()
+        self._seq = itertools.count()
+
+    async def send_message(self, channel_id: int, *, params: MultipartParameters) -> Any:
+        """drop-in replacement for :meth:`discord.http.HTTPClient.send_message`"""
+
+        channel = self.channels.get(int(channel_id))
+        if channel is None:
+            channel = self.channels[int(channel_id)] = _Channel(TokenBucket(self.channel_rate, self.channel_per))
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(send_priority.get(), next(self._seq), params, [future])
+
+        if job.priority == Priority.LOW and len(channel.jobs) >= self.max_queue:
+            latest = max((queued for queued in channel.jobs if queued.priority == Priority.LOW), default=None)
+            if latest is not None and latest.merge(job):
+                self.stats.merged += 1
+            else:
+                self.stats.dropped += 1
+                _log.debug(f"Dropped a low priority message to channel {channel_id}")
+                raise SendDropped(f"channel {channel_id} has {len(channel.jobs)} messages queued")
+        else:
+            heapq.heappush(channel.jobs, job)
+            channel.wakeup.set()
+
+        if channel.worker is None or channel.worker.done():
+            channel.worker = asyncio.create_task(self._drain(int(channel_id), channel))
+
+        queued_at = time.monotonic()
+        try:
+            return await future
+        finally:
+            waited = time.monotonic() - queued_at
+            self.stats.waits += 1
+            self.stats.total_wait += waited
+            self.stats.max_wait = max(self.stats.max_wait, waited)
+
+    async def _wait_for_token(self, channel: _Channel) -> None:
+        while True:
+            delay = max(channel.bucket.delay(), self.global_bucket.delay())
+            if delay == 0.0:
+                break
+            await asyncio.sleep(delay)
+
+        channel.bucket.consume()
+        self.global_bucket.consume()
+
+    async def _drain(self, channel_id: int, channel: _Channel) -> None:
+        while True:
+            if not channel.jobs:
+                # keep the bucket until it has refilled, a burst right after this one still counts against it
+                channel.wakeup.clear()
+                try:
+                    await asyncio.wait_for(channel.wakeup.wait(), channel.bucket.per)
+                except asyncio.TimeoutError:
+                    if not channel.jobs:
+                        self.channels.pop(channel_id, None)
+                        return
+                continue
+
+            await self._wait_for_token(channel)
+
+            job = heapq.heappop(channel.jobs)
+            futures = [future for future in job.futures if not future.done()]
+            if not futures:
+                # every caller gave up, give the token back
+                channel.bucket.tokens += 1
+                self.global_bucket.tokens += 1
+                continue
+
+            try:
+                data = await self._send(channel_id, params=job.params)
+            except Exception as exc:
+                self.stats.failed += 1
+                for future in futures:
+                    future.set_exception(exc)
+            else:
+                self.stats.sent += 1
+                for future in futures:
+                    future.set_result(data)
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(channel.jobs) for channel in self.channels.values())
+
+    def depth_by_priority(self) -> dict[str, int]:
+        depth = {p.name.lower(): 0 for p in Priority}
+        for channel in self.channels.values():
+            for job in channel.jobs:
+                depth[Priority(job.priority).name.lower()] += 1
+        return depth
+
+    def busiest(self, limit: int = 5) -> list[tuple[int, int]]:
+        depths = ((channel_id, len(channel.jobs)) for channel_id, channel in self.channels.items())
+        return sorted((item for item in depths if item[1]), key=lambda item: item[1], reverse=True)[:limit]
+
+    def close(self) -> None:
+        for channel in self.channels.values():
+            if channel.worker is not None:
+                channel.worker.cancel()
+            for job in channel.jobs:
+                for future in job.futures:
+                    future.cancel()
+        self.channels.clear()
@@ -0,0 +1,163 @@
+"""keeps gateway sessions across restarts so shards can RESUME instead of IDENTIFY
+
+on shutdown every shard's session id, sequence number and resume url are
+written to a file, the shards are closed with a code that keeps the
+sessions alive on discord's side. the next start reads the file once and
+deletes it, a session can only be resumed a single time.
+
+a RESUME only replays the events that were missed, the guilds a new
+process would have gotten from IDENTIFY are loaded over the rest api
+instead, see :func:`fetch_shard_guilds`
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from .bot import Amyrin
+
+# anything except 1000 and 1001 keeps the session resumable
+RESUMABLE_CLOSE_CODE = 4000
+
+# most guilds the api returns per page of /users/@me/guilds
+GUILDS_PAGE_SIZE = 200
+
+_log = logging.getLogger(__name__)
+
+
+@dataclass
+class SavedSession:
+    shard_id: int
+    session_id: str
+    sequence: Optional[int]
+    resume_url: str
+
+
+class SessionStore:
+    def __init__(self, config: Optional[dict[str, Any]] = None, cluster_id: Optional[int] = None) -> None:
+        config = config or {}
+        self.enabled: bool = config.get("resume", False)
+        # discord doesn't keep sessions around for long after the connection is gone
+        self.max_age: float = config.get("max_age", 60)
+
+        path = Path(config.get("session_file", "sessions.json"))
+        if cluster_id is not None:
+            path = path.with_name(f"{path.stem}-{cluster_id}{path.suffix}")
+        self.path = path
+
+    def _read(self) -> Optional[dict[str, Any]]:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        finally:
+            self.path.unlink(missing_ok=True)
+        return data
+
+    def load(self, shard_count: int) -> dict[int, SavedSession]:
+        """sessions saved by the last shutdown that can still be resumed"""
+
+        if not self.enabled:
+            return {}
+
+        try:
+            data = self._read()
+        except (OSError, ValueError) as exc:
+            _log.warning(f"Failed to read saved gateway sessions from {self.path}: {exc}")
+            return {}
+        if data is None:
+            return {}
+
+        age = time.time() - data.get("saved_at", 0)
+        if age > self.max_age:
+            _log.info(f"Saved gateway sessions are {age:.0f}s old, identifying instead")
+            return {}
+        if data.get("shard_count") != shard_count:
+            _log.info(f"Saved gateway sessions are for {data.get('shard_count')} shards, not {shard_count}, identifying instead")
+            return {}
+
+        sessions = {}
+        for session in data.get("sessions", []):
+            try:
+                saved = SavedSession(**session)
+            except TypeError:
+                continue
+            sessions[saved.shard_id] = saved
+        return sessions
+
+    def save(self, shard_count: int, sessions: list[SavedSession]) -> None:
+        data = {
+            "saved_at": time.time(),
+            "shard_count": shard_count,
+            "sessions": [asdict(session) for session in sessions],
+        }
+        # written next to the file and moved over it, a crash halfway leaves no broken file
+        temporary = self.path.with_name(f".{self.path.name}.tmp")
+        with temporary.open("w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temporary, self.path)
+
+
+async def list_guild_ids(bot: "Amyrin") -> list[int]:
+    ids: list[int] = []
+    after = None
+    while True:
+        page = await bot.http.get_guilds(GUILDS_PAGE_SIZE, after=after)
+        ids.extend(int(guild["id"]) for guild in page)
+        if len(page) < GUILDS_PAGE_SIZE:
+            return ids
+        after = ids[-1]
+
+
+async def _fetch_guild(bot: "Amyrin", guild_id: int) -> dict[str, Any]:
+    data, channels, me = await asyncio.gather(
+        bot.http.get_guild(guild_id, with_counts=True),
+        bot.http.get_all_guild_channels(guild_id),
+        bot.http.get_member(guild_id, bot.user.id), # type: ignore
+    )
+    data["channels"] = channels
+    # the guild only keeps members that are cached or the bot itself
+    data["members"] = [me]
+    data["member_count"] = data.get("approximate_member_count")
+    return data # type: ignore
+
+
+async def fetch_shard_guilds(
+    bot: "Amyrin", guild_ids: list[int], shard_id: int, shard_count: int, concurrency: int = 8
+) -> int:
+    """loads the guilds of a resumed shard into the cache, three requests per guild,
+    returns how many were loaded"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    state = bot._connection
+
+    async def load(guild_id: int) -> bool:
+        async with semaphore:
+            try:
+                data = await _fetch_guild(bot, guild_id)
+            except Exception as exc:
+                _log.warning(f"Failed to load guild {guild_id} after resuming: {exc}")
+                return False
+
+        try:
+            guild = state._add_guild_from_data(data) # type: ignore
+        except Exception as exc:
+            _log.warning(f"Failed to cache guild {guild_id} after resuming: {exc!r}")
+            return False
+        if state._guild_needs_chunking(guild):
+            try:
+                await guild.chunk()
+            except Exception as exc:
+                # the guild is cached, only its members are missing
+                _log.warning(f"Failed to chunk guild {guild_id} after resuming: {exc}")
+        return True
+
+    ids = [guild_id for guild_id in guild_ids if (guild_id >> 22) % shard_count == shard_id]
+    return sum(await asyncio.gather(*map(load, ids)))
@@ -0,0 +1,71 @@
+"""timings of everything that happens between starting the process and ready"""
+
+import time
+from dataclasses import dataclass, field
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+from typing import Any
+
+# perf_counter has no defined reference point, so take one as early as possible
+PROCESS_START = time.perf_counter()
+
+
+@dataclass
+class ExtensionTiming:
+    name: str
+    import_time: float = 0.0
+    setup_time: float = 0.0
+    error: str | None = None
+
+
+@dataclass
+class StartupProfile:
+    extensions: dict[str, ExtensionTiming] = field(default_factory=dict)
+    extensions_total: float = 0.0
+    login_at: float | None = None
+    shards_ready: dict[int, float] = field(default_factory=dict)
+    shards_resumed: set[int] = field(default_factory=set)
+    ready_at: float | None = None
+
+    def since_start(self) -> float:
+        return time.perf_counter() - PROCESS_START
+
+    def format(self) -> str:
+        lines = [f"{'extension':<24} {'import':>9} {'setup':>9}"]
+        for timing in sorted(self.extensions.values(), key=lambda t: t.import_time + t.setup_time, reverse=True):
+            line = f"{timing.name:<24} {timing.import_time * 1000:>7.1f}ms {timing.setup_time * 1000:>7.1f}ms"
+            if timing.error is not None:
+                line += f" failed: {timing.error}"
+            lines.append(line)
+        lines.append(f"all extensions (concurrently) {self.extensions_total * 1000:.1f}ms")
+
+        if self.login_at is not None:
+            lines.append(f"logged in after {self.login_at:.2f}s")
+        for shard_id, elapsed in sorted(self.shards_ready.items()):
+            how = "resumed" if shard_id in self.shards_resumed else "identified"
+            lines.append(f"shard {shard_id} ready after {elapsed:.2f}s ({how})")
+        if self.ready_at is not None:
+            lines.append(f"ready after {self.ready_at:.2f}s")
+        return "\n".join(lines)
+
+
+class TimedLoader:
+    """wraps a module loader to measure how long executing the module takes,
+    everything else is passed through so things like ``inspect.getsource`` work"""
+
+    def __init__(self, loader: Any, timing: ExtensionTiming) -> None:
+        self._loader = loader
+        self._timing = timing
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+    def create_module(self, spec: ModuleSpec) -> ModuleType | None:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timing.import_time += time.perf_counter() - start
@@ -0,0 +1,138 @@
+"""syncs the app command tree only where it changed
+
+the payload each scope (global or one guild) would send is hashed and
+compared with the hash of the last successful sync of that scope, which is
+kept in a small json file, matching scopes are skipped. scopes that had
+commands at the last sync but have none now are synced as well, so removed
+commands disappear from discord too
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import discord
+from discord import app_commands
+
+GLOBAL = "global"
+
+_log = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncResult:
+    scope: str
+    hash: str
+    commands: int
+    synced: bool
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    at: float = field(default_factory=time.time)
+
+    @property
+    def status(self) -> str:
+        if self.error is not None:
+            return f"failed: {self.error}"
+        return "synced" if self.synced else "unchanged"
+
+
+def _scope(guild_id: Optional[int]) -> str:
+    return GLOBAL if guild_id is None else str(guild_id)
+
+
+def digest(payload: list[dict[str, Any]]) -> str:
+    # commands are kept in insertion order, which depends on the order cogs were loaded in
+    ordered = sorted(payload, key=lambda command: (command.get("type", 1), command["name"]))
+    return hashlib.sha256(json.dumps(ordered, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class TreeSync:
+    def __init__(self, tree: app_commands.CommandTree, path: str = "command_tree.json") -> None:
+        self.tree = tree
+        self.path = Path(path)
+        # the latest result of every scope, synced or not
+        self.results: dict[str, SyncResult] = {}
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as exc:
+            _log.warning(f"Failed to read the app command sync state from {self.path}, syncing everything: {exc}")
+            return {}
+
+    def _save(self, state: dict[str, dict[str, Any]]) -> None:
+        temporary = self.path.with_name(f".{self.path.name}.tmp")
+        with temporary.open("w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temporary, self.path)
+
+    def guild_ids(self) -> set[int]:
+        """guilds that have commands of their own in the tree"""
+
+        # removing a guild's last command leaves an empty mapping behind
+        ids = {guild_id for guild_id, commands in self.tree._guild_commands.items() if commands}
+        ids.update(guild_id for _, guild_id, _ in self.tree._context_menus if guild_id is not None)
+        return ids
+
+    async def payload(self, guild_id: Optional[int]) -> list[dict[str, Any]]:
+        """exactly what :meth:`app_commands.CommandTree.sync` would send for the scope"""
+
+        guild = None if guild_id is None else discord.Object(guild_id)
+        commands = self.tree.get_commands(guild=guild)
+        translator = self.tree.translator
+        if translator:
+            return [await command.get_translated_payload(translator) for command in commands]
+        return [command.to_dict() for command in commands]
+
+    async def _sync_scope(self, guild_id: Optional[int], known: Optional[str], force: bool) -> SyncResult:
+        scope = _scope(guild_id)
+        payload = await self.payload(guild_id)
+        hash = digest(payload)
+        if not force and hash == known:
+            return SyncResult(scope, hash, len(payload), synced=False)
+
+        start = time.perf_counter()
+        try:
+            await self.tree.sync(guild=None if guild_id is None else discord.Object(guild_id))
+        except (discord.HTTPException, app_commands.AppCommandError) as exc:
+            return SyncResult(scope, hash, len(payload), synced=False, elapsed=time.perf_counter() - start, error=str(exc))
+        return SyncResult(scope, hash, len(payload), synced=True, elapsed=time.perf_counter() - start)
+
+    async def sync(self, *, force: bool = False) -> list[SyncResult]:
+        """syncs every scope whose commands changed since its last successful sync"""
+
+        async with self._lock:
+            state = await asyncio.to_thread(self._load)
+
+            scopes: set[Optional[int]] = {None, *self.guild_ids()}
+            scopes.update(int(scope) for scope in state if scope != GLOBAL)
+
+            results = await asyncio.gather(
+                *(self._sync_scope(guild_id, state.get(_scope(guild_id), {}).get("hash"), force) for guild_id in scopes)
+            )
+
+            for result in results:
+                self.results[result.scope] = result
+                entry = state.setdefault(result.scope, {})
+                if result.error is not None:
+                    # the old hash stays so the scope is tried again next time
+                    entry.update(error=result.error, failed_at=result.at)
+                elif result.synced:
+                    entry.update(hash=result.hash, commands=result.commands, synced_at=result.at, error=None)
+
+                # a guild without commands left has nothing to track once discord knows
+                if result.scope != GLOBAL and result.commands == 0 and result.error is None:
+                    del state[result.scope]
+
+            await asyncio.to_thread(self._save, state)
+            return sorted(results, key=lambda result: (result.scope != GLOBAL, result.scope))
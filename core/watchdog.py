@@ -0,0 +1,138 @@
+"""notices when something blocks the event loop and says what it was
+
+a task on the loop wakes up every ``interval`` and records how late it
+was, a thread outside the loop checks that it keeps doing so and when it
+stops for longer than ``threshold`` it grabs the loop thread's stack, so
+the blocking call shows up in the logs while it's still blocking
+"""
+
+import asyncio
+import inspect
+import logging
+import sys
+import threading
+import time
+import traceback
+from types import FrameType
+from typing import Any, Optional
+
+from .metrics import Histogram
+
+# frames of the stack that are logged, innermost last
+STACK_LIMIT = 20
+
+_log = logging.getLogger(__name__)
+
+
+def install_uvloop() -> bool:
+    """switches the event loop policy to uvloop if it's installed"""
+
+    try:
+        import uvloop
+    except ImportError:
+        _log.warning("uvloop is enabled in the config but isn't installed, using the default event loop")
+        return False
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def blocking_coroutine(frame: Optional[FrameType]) -> Optional[str]:
+    """qualified name of the outermost coroutine on the stack, which is the one the task is running"""
+
+    name = None
+    while frame is not None:
+        if frame.f_code.co_flags & (inspect.CO_COROUTINE | inspect.CO_ASYNC_GENERATOR):
+            name = frame.f_code.co_qualname
+        frame = frame.f_back
+    return name
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = 0.25, interval: float = 0.1) -> None:
+        self.threshold = threshold
+        self.interval = interval
+
+        self.lag = Histogram()
+        self.stalls = 0
+        self.longest_stall = 0.0
+        self.loop_name = ""
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self.loop_name = f"{type(self._loop).__module__}.{type(self._loop).__qualname__}"
+        self._beat = time.monotonic()
+        self._stopped.clear()
+
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag.observe(max(0.0, now - start - self.interval))
+            self._beat = now
+
+    def _watch(self) -> None:
+        stalled_since: Optional[float] = None
+
+        while not self._stopped.wait(self.interval / 2):
+            now = time.monotonic()
+            # how far past its next expected wake up the heartbeat is
+            late = now - self._beat - self.interval
+
+            if late >= self.threshold:
+                if stalled_since is None:
+                    stalled_since = self._beat + self.interval
+                    self.stalls += 1
+                    self._report(late)
+                continue
+
+            if stalled_since is not None:
+                duration = self._beat - stalled_since
+                self.longest_stall = max(self.longest_stall, duration)
+                _log.warning(f"Event loop was blocked for {duration:.3f}s")
+                stalled_since = None
+
+    def _report(self, late: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread) # type: ignore
+        if frame is None:
+            return
+
+        task = asyncio.current_task(self._loop) # type: ignore
+        coroutine = blocking_coroutine(frame)
+        if task is not None:
+            culprit = f'task "{task.get_name()}" running {coroutine or "?"}'
+        else:
+            culprit = f"a callback in {frame.f_code.co_qualname}"
+
+        stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+        _log.warning(f"Event loop blocked for {late:.3f}s by {culprit}, stack of the loop thread:\n{stack}")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "loop": self.loop_name,
+            "p50": self.lag.percentile(50),
+            "p99": self.lag.percentile(99),
+            "max": self.lag.max,
+            "mean": self.lag.mean,
+            "samples": self.lag.count,
+            "stalls": self.stalls,
+            "longest_stall": self.longest_stall,
+        }
@@ -1,22 +1,75 @@
 import ast
 import asyncio
+from collections import OrderedDict
+import contextlib
 from copy import copy
+import dataclasses
+from dataclasses import dataclass
+import hashlib
 import inspect
-import os
+import io
+import time
 import traceback
-from typing import Any, AsyncGenerator, Callable, Coroutine
+from types import CodeType
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Callable, Coroutine, Literal
 import discord
 import textwrap
 from discord.ext import commands
 import import_expression
 from core import Amyrin
-from jishaku.repl.compilation import wrap_code
-from jishaku.codeblocks import codeblock_converter, Codeblock
-from jishaku.repl import KeywordTransformer
+from core.git import Commit, GitError
+from core.http import pool_usage
+from core.memory import cache_sizes, current_rss, format_size, peak_rss
+from core.reloader import Reloader
+from core.sandbox import Sandbox, SandboxError
 
-from utils import Updater, executor
+from utils import PAGE_SIZE, AttachmentLimits, Paginator, Updater, codeblock, download_attachments, paginate, pools, run_in_pool
+
+if TYPE_CHECKING:
+    from jishaku.codeblocks import Codeblock
+
+CODE_CACHE_SIZE = 128
+
+# compiled snippets keyed by the sha256 of their source, most recently used last
+code_cache: "OrderedDict[str, tuple[CodeType, bool]]" = OrderedDict()
+
+BASE_ENV = {
+    "discord": discord,
+    "commands": commands,
+    "find": discord.utils.find,
+    "get": discord.utils.get,
+    "src": inspect.getsource,
+    "srcls": inspect.getsourcelines,
+}
+
+
+@dataclass
+class Timings:
+    parse: float = 0.0
+    compile: float = 0.0
+    execute: float = 0.0
+    cached: bool = False
+    fast_path: bool = False
+
+    def __str__(self) -> str:
+        flags = [name for name, on in (("cached", self.cached), ("fast path", self.fast_path)) if on]
+        fmt = (
+            f"parse {self.parse * 1000:.3f}ms | "
+            f"compile {self.compile * 1000:.3f}ms | "
+            f"execute {self.execute * 1000:.3f}ms"
+        )
+        return f"{fmt} ({', '.join(flags)})" if flags else fmt
+
+
+def codeblock_converter(argument: str) -> "Codeblock":
+    # importing anything from jishaku imports its whole cog, so wait until someone evals
+    from jishaku.codeblocks import codeblock_converter
+
+    return codeblock_converter(argument)
 
 def parse_code(code: str) -> ast.Module:
+    from jishaku.repl import KeywordTransformer
+
     fmt = f"""async def func():
     from importlib import import_module as {import_expression.constants.IMPORTER}
 {textwrap.indent(code, '    ')}""" # type: ignore
@@ -40,10 +93,68 @@ def parse_code(code: str) -> ast.Module:
 
     return fmt
 
-async def evaluate_code(ctx: commands.Context, env: dict, code: str):
+def parse_expression(code: str) -> ast.Expression | None:
+    """parses code that is a single plain expression, these don't need the
+    function wrapping, import expressions or keyword rewriting"""
+    
     try:
-        res = parse_code(code)
-        comp = compile(res, filename="<eval>", mode="exec")
+        tree = ast.parse(code, mode="eval")
+    except SyntaxError:
+        return None
+    
+    if any(isinstance(node, (ast.Yield, ast.YieldFrom)) for node in ast.walk(tree)):
+        return None
+    
+    return tree
+
+def compile_code(code: str, timings: Timings | None = None) -> tuple[CodeType, bool]:
+    """returns the compiled code and whether it is a plain expression"""
+    
+    timings = timings or Timings()
+    key = hashlib.sha256(code.encode()).hexdigest()
+    
+    cached = code_cache.get(key)
+    if cached is not None:
+        code_cache.move_to_end(key)
+        timings.cached = True
+        timings.fast_path = cached[1]
+        return cached
+    
+    start = time.perf_counter()
+    tree = parse_expression(code)
+    is_expression = tree is not None
+    if tree is None:
+        tree = parse_code(code)
+    timings.parse = time.perf_counter() - start
+    timings.fast_path = is_expression
+    
+    start = time.perf_counter()
+    if is_expression:
+        comp = compile(
+            tree, filename="<eval>", mode="eval", flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+        )
+    else:
+        comp = compile(tree, filename="<eval>", mode="exec")
+    timings.compile = time.perf_counter() - start
+    
+    code_cache[key] = (comp, is_expression)
+    if len(code_cache) > CODE_CACHE_SIZE:
+        code_cache.popitem(last=False)
+    
+    return comp, is_expression
+
+async def evaluate_expression(comp: CodeType, env: dict) -> Any:
+    result = eval(comp, env)
+    if comp.co_flags & inspect.CO_COROUTINE:
+        result = await result
+    return result
+
+async def evaluate_code(
+    ctx: commands.Context, env: dict, code: str, timings: Timings | None = None
+):
+    timings = timings or Timings()
+    try:
+        comp, is_expression = compile_code(code, timings)
     except Exception as exc:
         tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
         result = f"```py\n{tb}```"
@@ -52,7 +163,13 @@ async def evaluate_code(ctx: commands.Context, env: dict, code: str):
     """ Evaluating """
     result = None
     async with Updater(ctx):
+        start = time.perf_counter()
         try:
+            if is_expression:
+                value = await evaluate_expression(comp, env)
+                # the caller treats async generator functions as the wrapped snippet
+                return str(value) if inspect.isasyncgenfunction(value) else value
+            
             exec(comp, env)
             func: Callable = env.get("func") # type: ignore
             if inspect.isasyncgenfunction(func):
@@ -63,17 +180,294 @@ async def evaluate_code(ctx: commands.Context, env: dict, code: str):
             result = "".join(
                 traceback.format_exception(type(exc), exc, exc.__traceback__)
             )
+        finally:
+            timings.execute += time.perf_counter() - start
 
         if result is not None and len(str(result.strip())) > 0:
             return result
 
 
+async def evaluate_detached(env: dict, code: str) -> str:
+    """evaluates code without a context to report to, used for code sent
+    to this cluster over ipc"""
+    
+    try:
+        comp, is_expression = compile_code(code)
+        if is_expression:
+            result = await evaluate_expression(comp, env)
+            return "" if result is None else repr(result)
+        
+        exec(comp, env)
+        func: Callable = env["func"]
+        if inspect.isasyncgenfunction(func):
+            results = [repr(i) async for i in func() if i is not None]
+        else:
+            await func()
+            results = []
+    except Exception as exc:
+        return "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+
+    return "\n".join(results)
+
+
+class EmitWriter(io.TextIOBase):
+    """stdout of the sandbox worker, complete lines are sent to the bot as they are printed"""
+
+    def __init__(self, emit: Callable[[str, str], None]) -> None:
+        self.emit = emit
+        self.buffer = ""
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        lines, sep, self.buffer = self.buffer.rpartition("\n")
+        if sep:
+            self.emit("stdout", lines)
+        return len(text)
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.emit("stdout", self.buffer)
+            self.buffer = ""
+
+
+def emit_result(emit: Callable[[str, str], None], value: Any) -> None:
+    if value is not None:
+        emit("result", value if isinstance(value, str) else repr(value))
+
+
+async def evaluate_isolated(code: str, emit: Callable[[str, str], None]) -> None:
+    """runs in the sandbox worker, there is no bot there so only the base globals are available"""
+    
+    env = {**BASE_ENV}
+    stdout = EmitWriter(emit)
+    try:
+        with contextlib.redirect_stdout(stdout):
+            comp, is_expression = compile_code(code)
+            if is_expression:
+                emit_result(emit, await evaluate_expression(comp, env))
+                return
+            
+            exec(comp, env)
+            func: Callable = env["func"]
+            if inspect.isasyncgenfunction(func):
+                async for i in func():
+                    stdout.flush()
+                    emit_result(emit, i)
+            else:
+                await func()
+    except Exception as exc:
+        stdout.flush()
+        emit("error", "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)))
+    finally:
+        stdout.flush()
+
+
+class OutputSink:
+    """collects text yielded by an eval generator and shows it in one message
+
+    text is buffered and flushed when enough of it piled up or enough time
+    passed, each flush edits the same message instead of sending a new one.
+    once the output outgrows a message it becomes paginated, and once it
+    outgrows ``file_threshold`` it is uploaded as a file at the end
+    """
+
+    def __init__(
+        self,
+        ctx: commands.Context,
+        *,
+        flush_size: int = 1800,
+        flush_interval: float = 1.0,
+        file_threshold: int = 20_000,
+        max_size: int = 8 * 1024 * 1024,
+    ) -> None:
+        self.ctx = ctx
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.file_threshold = file_threshold
+        self.max_size = max_size
+
+        self.pending: list[str] = []
+        self.pending_size = 0
+        self.output = ""
+        # how much of the output the message shows, the rest is redrawn on the next flush
+        self.shown = 0
+        self.truncated = False
+
+        self.message: discord.Message | None = None
+        self.view: Paginator | None = None
+        self.as_file = False
+
+        self._lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "OutputSink":
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            # it may be halfway through an edit, that output is redrawn by close
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+        await self.close()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self.pending:
+                await self.flush()
+
+    async def write(self, value: Any) -> None:
+        if isinstance(value, (discord.Embed, discord.File, discord.Attachment, discord.ui.View)) or (
+            isinstance(value, list)
+            and value
+            and all(isinstance(i, (discord.Embed, discord.File, discord.Attachment)) for i in value)
+        ):
+            # rich output can't be merged into text, keep the order and start over after it
+            async with self._lock:
+                await self._flush()
+                await send(self.ctx, value)
+                self._reset()
+            return
+
+        text = str(value)
+        self.pending.append(text)
+        self.pending_size += len(text) + 1
+        if self.pending_size >= self.flush_size:
+            await self.flush()
+
+    def _reset(self) -> None:
+        self.output = ""
+        self.shown = 0
+        self.truncated = False
+        self.message = None
+        self.view = None
+        self.as_file = False
+
+    async def flush(self) -> None:
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self.pending:
+            chunk = "\n".join(self.pending) + "\n"
+            self.pending.clear()
+            self.pending_size = 0
+
+            if len(self.output) + len(chunk) > self.max_size:
+                chunk = chunk[: max(0, self.max_size - len(self.output))]
+                self.truncated = True
+            self.output += chunk
+
+        if self.as_file or self.shown == len(self.output):
+            return
+
+        if len(self.output) > self.file_threshold:
+            content = f"Output is {len(self.output)} characters long, it will be uploaded when done."
+            if self.message is None:
+                self.message = await self.ctx.send(content)
+            else:
+                await self.message.edit(content=content, view=None)
+            self.as_file = True
+            if self.view is not None:
+                self.view.stop()
+            return
+
+        pages = paginate(self.output)
+        if len(pages) == 1:
+            content, view = codeblock(pages[0]), None
+        else:
+            if self.view is None:
+                self.view = Paginator(self.ctx.author.id, pages)
+            self.view.set_pages(pages)
+            content, view = self.view.content, self.view
+
+        shown = len(self.output)
+        if self.message is None:
+            self.message = await self.ctx.send(content, view=view)
+        else:
+            await self.message.edit(content=content, view=view)
+        if self.view is not None:
+            self.view.message = self.message
+        self.shown = shown
+
+    async def close(self) -> None:
+        await self.flush()
+
+        if self.as_file:
+            if self.truncated:
+                self.output += "\n[output truncated]\n"
+            file = discord.File(io.BytesIO(self.output.encode()), filename="output.txt")
+            await self.ctx.send(file=file)
+
+
+class StopView(discord.ui.View):
+    """a button that cancels a running task, only for the one who started it"""
+
+    def __init__(self, author_id: int, task: asyncio.Task) -> None:
+        super().__init__(timeout=None)
+        self.author_id = author_id
+        self.task = task
+        self.cancelled = False
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    @discord.ui.button(label="Stop", style=discord.ButtonStyle.danger)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        self.cancelled = True
+        self.task.cancel()
+        self.stop()
+        await interaction.response.edit_message(content="Cancelled, the sandbox worker was killed.", view=None)
+
+
 async def handle_async_generator(
-    ctx: commands.Context, func: Coroutine[Any, Any, AsyncGenerator], *args, **kwargs
+    ctx: commands.Context, func: Coroutine[Any, Any, AsyncGenerator], **options
 ):
-    async for i in func(): # type: ignore
-        if i is not None:
-            await send(ctx, i, *args, **kwargs)
+    async with OutputSink(ctx, **options) as sink:
+        async for i in func(): # type: ignore
+            if i is not None:
+                await sink.write(i)
+
+
+async def send_text(ctx: commands.Context, text: str, *args, max_pages: int = 10, **kwargs):
+    """sends text that doesn't fit in a single message, paginated or as a file"""
+    
+    pages = paginate(text)
+    if len(pages) > max_pages:
+        file = discord.File(io.BytesIO(text.encode()), filename="output.txt")
+        return await ctx.send(file=file, *args, **kwargs)
+    
+    view = Paginator(ctx.author.id, pages, index=0)
+    view.message = await ctx.send(view.content, view=view, *args, **kwargs)
+    return view.message
+
+
+async def send_attachments(
+    ctx: commands.Context, attachments: list[discord.Attachment], *args, **kwargs
+):
+    limits: AttachmentLimits = ctx.bot.config.attachments
+    if ctx.guild is not None:
+        upload_limit = ctx.guild.filesize_limit
+        limits = dataclasses.replace(
+            limits,
+            max_file_size=min(limits.max_file_size, upload_limit),
+            max_total_size=min(limits.max_total_size, upload_limit),
+        )
+    
+    result = await download_attachments(attachments, limits, session=ctx.bot.session)
+    
+    content = None
+    if result.skipped:
+        content = "\n".join(f"skipped {name}: {reason}" for name, reason in result.skipped)
+    if not result.files:
+        return await ctx.send(content, *args, **kwargs)
+    
+    return await ctx.send(content, files=result.files, *args, **kwargs)
 
 
 async def send(ctx: commands.Context, result, *args, **kwargs):
@@ -81,56 +475,66 @@ async def send(ctx: commands.Context, result, *args, **kwargs):
         if all(isinstance(i, discord.Embed) for i in result):
             return await ctx.send(embeds=result, *args, **kwargs)
         if all(isinstance(i, discord.Attachment) for i in result):
-            return await ctx.send(
-                files=[await i.to_file() for i in result], *args, **kwargs
-            )
+            return await send_attachments(ctx, result, *args, **kwargs)
         if all(isinstance(i, discord.File) for i in result):
             return await ctx.send(files=result, *args, **kwargs)
-        return await ctx.send(str(result), *args, **kwargs)
+        return await send(ctx, str(result), *args, **kwargs)
     if isinstance(result, discord.Embed):
         return await ctx.send(embed=result, *args, **kwargs)
     if isinstance(result, discord.Attachment):
-        return await ctx.send(file=await result.to_file(), *args, **kwargs)
+        return await send_attachments(ctx, [result], *args, **kwargs)
     if isinstance(result, discord.File):
         return await ctx.send(file=result, *args, **kwargs)
     if isinstance(result, str):
+        if len(result) > PAGE_SIZE:
+            return await send_text(ctx, result, *args, **kwargs)
         if len(result.splitlines()) > 1:
-            return await ctx.send(
-                f"```py\n{str(result).replace('``', '`​`')}```", *args, **kwargs
-            )
+            return await ctx.send(codeblock(result), *args, **kwargs)
         return await ctx.send(result, *args, **kwargs)
     if isinstance(result, discord.ui.View):
         return await ctx.send(view=result, *args, **kwargs)
     if result is None:
         return
 
-    return await ctx.send(str(result), *args, **kwargs)
+    return await send(ctx, str(result), *args, **kwargs)
+
 
 class Cog(commands.Cog, name="Developer", command_attrs={"hidden": True}):
     def __init__(self, bot: Amyrin) -> None:
         self.bot = bot
+        # the worker is only started by the first evalisolated
+        self.sandbox = Sandbox("exts.developer:evaluate_isolated", bot.config.sandbox)
+        
+    async def cog_load(self) -> None:
+        if self.bot.ipc is not None:
+            self.bot.ipc.add_handler("eval", self.ipc_eval)
+        
+    async def cog_unload(self) -> None:
+        if self.bot.ipc is not None:
+            self.bot.ipc.remove_handler("eval")
+        await self.sandbox.close()
+        
+    async def ipc_eval(self, code: str) -> str:
+        env = {**BASE_ENV, "bot": self.bot}
+        return await evaluate_detached(env, code)
         
     async def cog_check(self, ctx: commands.Context) -> bool:
         if not await self.bot.is_owner(ctx.author):
             raise commands.NotOwner
         return True
         
-    @executor()
-    def pull(self) -> ...:
-        git = self.bot.git
+    async def pull(self) -> tuple[list[tuple[str, str]], list[Commit]]:
         remote, branch = "origin", "rewrite" # you can change rewrite to main or master, depending on what branch your code is on
         
-        remote = git.remote(remote)
-        remote.pull(branch)
-        
-        diff = git.head.commit.diff(None, create_patch=True)
+        before, after = await self.bot.git.pull(remote, branch)
+        if before == after:
+            return [], []
         
-        updated_items: list[os.PathLike] = [
-            item for item in diff
-            if item.change_type == "M"
-        ]
-        
-        return updated_items
+        changes, commits = await asyncio.gather(
+            self.bot.git.diff_name_status(before, after),
+            self.bot.git.log(before, after),
+        )
+        return changes, commits
         
         
     @commands.group(
@@ -152,36 +556,410 @@ class Cog(commands.Cog, name="Developer", command_attrs={"hidden": True}):
         
         code: Codeblock = code # typing 😊😊😊😊😊😊😊😊😊
         
+        await self.run_eval(ctx, code.content)
+        
+    @commands.command(name="evaltimed", aliases=["et"])
+    async def _evaltimed(self, ctx: commands.Context, *, code: codeblock_converter): # type: ignore
+        """Command to evaluate code and show how long parsing, compiling and executing took
+
+        Parameters
+        -----------
+        code: str
+            The code to evaluate, supports codeblocks
+            
+        Example
+        -------
+        {prefix}evaltimed len(bot.guilds)
+        """
+        
+        code: Codeblock = code
+        
+        timings = Timings()
+        await self.run_eval(ctx, code.content, timings)
+        await ctx.send(f"`{timings}`")
+        
+    def make_env(self, ctx: commands.Context) -> dict:
         ref = None if ctx.message.reference is None else ctx.message.reference.resolved
-        env = {
-            "discord": discord,
-            "commands": commands,
+        return {
+            **BASE_ENV,
             "author": ctx.message.author,
             "bot": self.bot,
             "channel": ctx.message.channel,
-            "find": discord.utils.find,
             "ctx": ctx,
-            "get": discord.utils.get,
             "guild": ctx.message.guild,
             "message": ctx.message,
             "msg": ctx.message,
-            "src": inspect.getsource,
-            "srcls": inspect.getsourcelines,
-            "commands": commands,
             "ref": ref,
             "rf": ref,
         }
         
+    async def run_eval(self, ctx: commands.Context, code: str, timings: Timings | None = None) -> None:
+        timings = timings or Timings()
+        env = self.make_env(ctx)
+        
         """ Code Parsing """
 
-        result = await evaluate_code(ctx, env, code.content)
+        result = await evaluate_code(ctx, env, code, timings)
 
         if inspect.isasyncgenfunction(result):
-            return await handle_async_generator(ctx, result) # type: ignore
+            start = time.perf_counter()
+            await handle_async_generator(ctx, result) # type: ignore
+            timings.execute += time.perf_counter() - start
+            return
 
         if result is not None:
             await send(ctx, result)
             
+    @commands.command(name="evalisolated", aliases=["ei"])
+    async def _evalisolated(self, ctx: commands.Context, *, code: codeblock_converter): # type: ignore
+        """Command to evaluate code in a separate process, with a time limit, a cpu time limit and a memory limit
+
+        The process has no access to the bot, use eval for anything that needs it.
+        Output is sent while the code runs, the stop button kills the process.
+
+        Parameters
+        -----------
+        code: str
+            The code to evaluate, supports codeblocks
+            
+        Example
+        -------
+        {prefix}evalisolated sum(i * i for i in range(10**7))
+        """
+        
+        code: Codeblock = code
+        
+        limits = self.sandbox.limits
+        task = asyncio.create_task(self.run_isolated(ctx, code.content))
+        view = StopView(ctx.author.id, task)
+        waiting = " after the eval before it" if self.sandbox.busy else ""
+        status = await ctx.send(
+            f"Running in the sandbox{waiting} (timeout {limits.timeout}s, cpu time {limits.cpu_time}s)",
+            view=view,
+        )
+        
+        start = time.perf_counter()
+        outcome = "Done"
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not view.cancelled:
+                raise
+            return
+        except SandboxError as exc:
+            outcome = "Stopped"
+            await send(ctx, f"Sandbox: {exc}, the worker will be restarted for the next eval")
+        finally:
+            task.cancel()
+            view.stop()
+        
+        with contextlib.suppress(discord.HTTPException):
+            await status.edit(content=f"{outcome} after {time.perf_counter() - start:.2f}s", view=None)
+        
+    async def run_isolated(self, ctx: commands.Context, code: str) -> None:
+        async with OutputSink(ctx) as sink, contextlib.aclosing(self.sandbox.run(code)) as output:
+            async for _, text in output:
+                await sink.write(text)
+            
+    @commands.command(name="clustereval", aliases=["ce"])
+    async def _clustereval(self, ctx: commands.Context, *, code: codeblock_converter): # type: ignore
+        """Command to evaluate code on every cluster and gather the results
+
+        Parameters
+        -----------
+        code: str
+            The code to evaluate, supports codeblocks
+            
+        Example
+        -------
+        {prefix}clustereval len(bot.guilds)
+        """
+        
+        code: Codeblock = code
+        
+        if self.bot.ipc is None:
+            return await ctx.send("The bot isn't running in cluster mode.")
+        
+        async with Updater(ctx):
+            results = await self.bot.ipc.broadcast("eval", code.content)
+        
+        lines = []
+        for result in results:
+            output = result.get("error", result.get("data")) or "None"
+            lines.append(f"# cluster {result['cluster_id']}\n{output}")
+        
+        await send(ctx, "\n".join(lines) + "\n")
+            
+    @commands.command(name="pools")
+    async def _pools(self, ctx: commands.Context):
+        """Shows how busy the executor pools, the http connection pool and the send queue are
+        
+        Examples:
+        
+          {prefix}pools
+        """
+        
+        lines = []
+        for pool in pools.values():
+            stats = pool.stats()
+            lines.append(
+                f"{stats['name']:<4} workers {stats['workers']:<3} "
+                f"in flight {stats['in_flight']:<3} queued {stats['queue_depth']:<3} "
+                f"done {stats['completed']:<6} failed {stats['failed']:<4} "
+                f"wait avg {stats['avg_wait'] * 1000:.2f}ms max {stats['max_wait'] * 1000:.2f}ms"
+            )
+        
+        usage = pool_usage(self.bot.session)
+        stats = self.bot.http_stats
+        lines.append(
+            f"http connections {usage.get('in_use', 0)} in use, {usage.get('idle', 0)} idle "
+            f"(limit {usage.get('limit')}, {usage.get('limit_per_host')} per host) | "
+            f"requests {stats.requests} failed {stats.failed} | "
+            f"connections created {stats.connections_created} reused {stats.connections_reused} | "
+            f"dns cache {stats.dns_cache_hits} hits {stats.dns_cache_misses} misses"
+        )
+        
+        sender = self.bot.sender
+        depth = ", ".join(f"{name} {count}" for name, count in sender.depth_by_priority().items())
+        busiest = ", ".join(f"{channel_id} ({count})" for channel_id, count in sender.busiest())
+        stats = sender.stats
+        lines.append(
+            f"send queue {sender.queue_depth} ({depth}) in {len(sender.channels)} channel(s) | "
+            f"sent {stats.sent} merged {stats.merged} dropped {stats.dropped} failed {stats.failed} | "
+            f"wait avg {stats.avg_wait * 1000:.2f}ms max {stats.max_wait * 1000:.2f}ms"
+            + (f" | busiest {busiest}" if busiest else "")
+        )
+        
+        await send(ctx, "\n".join(lines) + "\n")
+            
+    @commands.command(name="commandstats", aliases=["cs"])
+    async def _commandstats(self, ctx: commands.Context, *, command: str | None = None):
+        """Shows latency, error rate and throughput per command
+        
+        Examples:
+        
+          {prefix}commandstats
+          {prefix}commandstats eval
+
+        Parameters
+        -----------
+        command: str
+            Only show this command
+        """
+        
+        metrics = self.bot.metrics
+        items = sorted(
+            metrics.commands.items(),
+            key=lambda item: item[1].latency.percentile(99),
+            reverse=True,
+        )
+        if command is not None:
+            items = [item for item in items if item[0] == command.lower()]
+        
+        if not items:
+            return await ctx.send("No commands have been run yet.")
+        
+        header = f"{'command':<16} {'runs':>6} {'err%':>5} {'busy':>4} {'p50':>8} {'p99':>8} {'max':>8} {'send':>8} {'/min':>6}"
+        lines = [header]
+        for name, stats in items[:20]:
+            latency = stats.latency
+            lines.append(
+                f"{name[:16]:<16} {stats.invocations:>6} {stats.error_rate * 100:>5.1f} {stats.in_flight:>4} "
+                f"{latency.percentile(50) * 1000:>6.0f}ms {latency.percentile(99) * 1000:>6.0f}ms "
+                f"{latency.max * 1000:>6.0f}ms {stats.send.mean * 1000:>6.0f}ms "
+                f"{metrics.throughput(command=name) * 60:>6.1f}"
+            )
+        
+        await send(ctx, "\n".join(lines))
+            
+    @commands.command(name="errors")
+    async def _errors(self, ctx: commands.Context, fingerprint: str | None = None):
+        """Shows the errors that happened most often, or the traceback of one of them
+        
+        Examples:
+        
+          {prefix}errors
+          {prefix}errors 3f2a9c01d4
+
+        Parameters
+        -----------
+        fingerprint: str
+            The error to show the traceback of
+        """
+        
+        store = self.bot.error_store
+        if fingerprint is not None:
+            entry = store.get(fingerprint)
+            if entry is None:
+                return await ctx.send(f'No error with the fingerprint "{fingerprint}".')
+            return await send(ctx, f"{entry.command} | {entry.location}\n{entry.format()}")
+        
+        entries = store.top(15)
+        if not entries:
+            return await ctx.send("No errors have been recorded.")
+        
+        now = time.monotonic()
+        lines = [f"{store.total} error(s), {len(store.entries)} distinct"]
+        for entry in entries:
+            lines.append(
+                f"{entry.fingerprint} {entry.count:>5}x {entry.type} in {entry.command} "
+                f"at {entry.location} (last {now - entry.last_seen:.0f}s ago)"
+            )
+        
+        await send(ctx, "\n".join(lines))
+            
+    @commands.command(name="lag")
+    async def _lag(self, ctx: commands.Context):
+        """Shows how far behind the event loop has been and how often it was blocked
+        
+        Examples:
+        
+          {prefix}lag
+        """
+        
+        stats = self.bot.watchdog.stats()
+        await send(
+            ctx,
+            f"{stats['loop']}: lag p50 {stats['p50'] * 1000:.1f}ms p99 {stats['p99'] * 1000:.1f}ms "
+            f"max {stats['max'] * 1000:.1f}ms mean {stats['mean'] * 1000:.2f}ms over {stats['samples']} samples\n"
+            f"blocked {stats['stalls']} time(s), longest {stats['longest_stall']:.3f}s",
+        )
+            
+    @commands.command(name="startup")
+    async def _startup(self, ctx: commands.Context):
+        """Shows how long each extension took to import and set up and when each shard became ready
+        
+        Examples:
+        
+          {prefix}startup
+        """
+        
+        await send(ctx, self.bot.startup.format())
+            
+    @commands.group(name="memory", aliases=["mem"], invoke_without_command=True)
+    async def _memory(self, ctx: commands.Context):
+        """Shows how much memory the bot uses and how big its caches are
+        
+        Examples:
+        
+          {prefix}memory
+          {prefix}memory start 5
+          {prefix}memory diff 20
+          {prefix}memory stop
+        """
+        
+        rss = current_rss()
+        lines = [f"rss {format_size(rss) if rss is not None else 'unknown'}, peak {format_size(peak_rss())}"]
+        
+        tracer = self.bot.memory
+        if tracer.tracing:
+            current, peak, overhead = tracer.traced()
+            since = f" for {time.monotonic() - tracer.started_at:.0f}s" if tracer.started_at is not None else ""
+            lines.append(
+                f"tracing{since}: {format_size(current)} traced, peak {format_size(peak)}, "
+                f"{format_size(overhead)} used by tracemalloc"
+            )
+        else:
+            lines.append("not tracing")
+        
+        sizes = {**cache_sizes(self.bot), "eval code cache": len(code_cache)}
+        width = max(map(len, sizes))
+        lines.append("")
+        lines.extend(f"{name:<{width}} {count:>9,}" for name, count in sizes.items())
+        
+        await send(ctx, "\n".join(lines))
+        
+    @_memory.command(name="start")
+    async def _memory_start(self, ctx: commands.Context, frames: int = 1):
+        """Starts tracing allocations, diffs compare against what was allocated at this point
+        
+        Examples:
+        
+          {prefix}memory start
+          {prefix}memory start 5
+        """
+        
+        if not 1 <= frames <= 100:
+            return await ctx.send("frames needs to be between 1 and 100")
+        
+        self.bot.memory.start(frames)
+        await ctx.send(f"Tracing allocations with {frames} frame(s), use `{ctx.clean_prefix}memory diff` to see what grew")
+        
+    @_memory.command(name="diff")
+    async def _memory_diff(self, ctx: commands.Context, limit: int = 15, group_by: str = "lineno"):
+        """Shows what grew since tracing started grouped by line or file, the full list is attached
+        
+        Examples:
+        
+          {prefix}memory diff
+          {prefix}memory diff 30 filename
+        """
+        
+        tracer = self.bot.memory
+        if tracer.baseline is None:
+            return await ctx.send(f"Not tracing, use `{ctx.clean_prefix}memory start` first")
+        if group_by not in ("lineno", "filename"):
+            return await ctx.send('group_by needs to be "lineno" or "filename"')
+        
+        async with Updater(ctx):
+            # snapshots of a long trace take a while to compare
+            diffs = await run_in_pool("io", tracer.diff, group_by)
+        
+        def row(diff) -> str:
+            return (
+                f"{format_size(diff.size_diff, signed=True):>12} {diff.count_diff:>+9,} "
+                f"{format_size(diff.size):>11} {diff.location}"
+            )
+        
+        header = f"{'size diff':>12} {'count':>9} {'total':>11} location"
+        growth = sum(diff.size_diff for diff in diffs)
+        summary = f"{format_size(growth, signed=True)} over {len(diffs)} location(s)"
+        
+        table = "\n".join([header, *map(row, diffs[:limit])])
+        file = discord.File(
+            io.BytesIO("\n".join([summary, header, *map(row, diffs)]).encode()), filename="memory_diff.txt"
+        )
+        await ctx.send(f"{summary}\n{codeblock(table[:PAGE_SIZE], 'prolog')}", file=file)
+        
+    @_memory.command(name="stop")
+    async def _memory_stop(self, ctx: commands.Context):
+        """Stops tracing allocations and frees what tracemalloc used
+        
+        Examples:
+        
+          {prefix}memory stop
+        """
+        
+        if not self.bot.memory.tracing:
+            return await ctx.send("Not tracing")
+        
+        self.bot.memory.stop()
+        await ctx.send("Stopped tracing allocations")
+            
+    @commands.command(name="sync")
+    async def _sync(self, ctx: commands.Context, mode: Literal["force"] | None = None):
+        """Syncs the app command tree where it changed since the last sync, force syncs every scope
+        
+        Examples:
+        
+          {prefix}sync
+          {prefix}sync force
+        """
+        
+        async with Updater(ctx):
+            results = await self.bot.sync_app_commands(force=mode == "force")
+        
+        if not results:
+            return await ctx.send("Failed to sync, check the logs")
+        
+        width = max(len(result.scope) for result in results)
+        lines = [
+            f"{result.scope:<{width}} {result.commands:>3} command(s) {result.hash[:10]} {result.status}"
+            + (f" in {result.elapsed:.2f}s" if result.synced else "")
+            for result in results
+        ]
+        await send(ctx, "\n".join(lines))
+        
     @commands.command(name="as", aliases=["su"])
     async def _as(self, ctx: commands.Context, user: discord.Member, *, command: str):
         """Command to simulate a user running a command
@@ -198,10 +976,11 @@ class Cog(commands.Cog, name="Developer", command_attrs={"hidden": True}):
             The command to simulate the user running
         """
         
-        prefix = ctx.prefix # TODO: remember to make this work with per user prefixes if i ever implement them
+        # the simulated user might not have access to the prefix that was used here
+        prefix = self.bot.prefixes.resolve(user.id, ctx.guild.id if ctx.guild else None)[0]
         
         msg = copy(ctx.message)
-        msg.content = prefix + command # type: ignore
+        msg.content = prefix + command
         msg.author = user
         
         await self.bot.process_commands(msg)
@@ -215,12 +994,30 @@ class Cog(commands.Cog, name="Developer", command_attrs={"hidden": True}):
           {prefix}pull
         """
         
-        print("ran")
-        result = await self.pull()
-        print(result)
-    
-    
+        async with Updater(ctx):
+            try:
+                changes, commits = await self.pull()
+            except GitError as exc:
+                return await send(ctx, exc.stderr or str(exc))
+            
+            reloader = Reloader(self.bot)
+            plan = reloader.plan(changes)
+            result = await reloader.apply(plan)
+        
+        lines = [f"{commit.short_sha} {commit.subject} ({commit.author})" for commit in commits]
+        lines.append(f"{len(changes)} file(s) changed")
+        for action, name, elapsed in result.timings:
+            lines.append(f"{action:<7} {name} ({elapsed * 1000:.2f}ms)")
         
+        if not result.ok:
+            error = "".join(traceback.format_exception(type(result.error), result.error, result.error.__traceback__)) # type: ignore
+            lines.append(f"failed to reload {result.failed}, rolled everything back:\n{error}")
+        
+        if result.restart_required:
+            lines.append(f"restart required for: {', '.join(result.restart_required)}")
+        
+        await send(ctx, "\n".join(lines))
+    
     
 async def setup(bot: Amyrin):
     await bot.add_cog(Cog(bot=bot))
\ No newline at end of file
@@ -1,14 +1,16 @@
 # credits to https://gist.github.com/EvieePy/7822af90858ef65012ea500bcecf1612
 
+import logging
 import random
-import traceback
 
-import discord
-import humanfriendly
 from discord import app_commands
 from discord.ext import commands
 
 from core import Amyrin
+from core.sender import Priority, SendDropped, priority, send_priority
+
+
+_log = logging.getLogger(__name__)
 
 
 class Cog(commands.Cog, name="Errors"):
@@ -17,6 +19,16 @@ class Cog(commands.Cog, name="Errors"):
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx: commands.Context, error):
+        # replies to errors are the first thing to go when a channel is backed up,
+        # unless they're for the owner
+        level = send_priority.get()
+        with priority(level if level is Priority.HIGH else Priority.LOW):
+            try:
+                await self.handle_error(ctx, error)
+            except SendDropped:
+                pass
+
+    async def handle_error(self, ctx: commands.Context, error):
         if hasattr(ctx.command, "on_error"):
             return
 
@@ -49,6 +61,8 @@ class Cog(commands.Cog, name="Errors"):
         elif isinstance(
             error, (app_commands.CommandOnCooldown, commands.CommandOnCooldown)
         ):
+            import humanfriendly  # only needed here, so it isn't imported at startup
+
             retry_after = humanfriendly.format_timespan(round(error.retry_after, 1))
             options = [
                 (
@@ -121,12 +135,21 @@ class Cog(commands.Cog, name="Errors"):
             return await ctx.reply(msg)
 
         else:
+            command = ctx.command.qualified_name if ctx.command else None
+            entry, report = self.bot.error_store.record(error, command)
+            if not report:
+                # already reported this window, only counted
+                return
+
+            formatted_error = entry.format(error)
+            seen = f"{entry.suppressed} time(s) since the last report, {entry.count} in total"
+            self.bot.error_store.mark_reported(entry)
+            _log.error(f"Command {command} raised {entry.type} [{entry.fingerprint}] ({seen})\n{formatted_error}")
+
             if await self.bot.is_owner(ctx.author):
-                formatted_error = traceback.format_exception(
-                    type(error), error, error.__traceback__ # type: ignore
+                return await ctx.send(
+                    f"[{entry.fingerprint}] seen {seen}\n```py\n{formatted_error[-1800:]}\n```"
                 )
-                formatted_error = "".join(formatted_error)
-                return await ctx.send(f"```py\n{formatted_error}\n```")
 
             await ctx.reply("errored lol")
 
@@ -1,12 +1,86 @@
 import re
-from typing import Optional
+from collections import OrderedDict
+from typing import Iterable, Optional
 import discord
 from discord.ext import commands
 from core import Amyrin
 
 FORMAT_REGEX = re.compile(r"{([^{}]+)}")
 
+# rendered pages kept, most recently used last, every prefix gets its own
+PAGE_CACHE_SIZE = 128
+
+class HelpIndex:
+    """case insensitive lookup tables and rendered pages for the help command
+
+    help command instances are copied for every invocation, so this lives on
+    module level, everything is thrown away whenever an extension is loaded,
+    unloaded or reloaded. only pages that look the same to everyone are kept
+    """
+
+    def __init__(self) -> None:
+        self.generation = -1
+        self.cogs: dict[str, commands.Cog] = {}
+        self.commands: dict[str, commands.Command] = {}
+        self.pages: "OrderedDict[tuple[str, str, str], list[str]]" = OrderedDict()
+
+    def _index_commands(self, mapping: dict[str, commands.Command], parent: str = "") -> None:
+        for name, command in mapping.items():
+            key = f"{parent}{name.lower()}"
+            self.commands.setdefault(key, command)
+            if isinstance(command, commands.Group):
+                self._index_commands(command.all_commands, f"{key} ")
+
+    def ensure(self, bot: Amyrin) -> None:
+        if self.generation == bot.extension_generation:
+            return
+
+        self.cogs = {name.lower(): cog for name, cog in bot.cogs.items()}
+        self.commands = {}
+        self._index_commands(bot.all_commands)
+        self.pages = OrderedDict()
+        self.generation = bot.extension_generation
+
+    def get_pages(self, key: tuple[str, str, str]) -> Optional[list[str]]:
+        pages = self.pages.get(key)
+        if pages is not None:
+            self.pages.move_to_end(key)
+        return pages
+
+    def store_pages(self, key: tuple[str, str, str], pages: list[str]) -> None:
+        self.pages[key] = pages
+        if len(self.pages) > PAGE_CACHE_SIZE:
+            self.pages.popitem(last=False)
+
+
+index = HelpIndex()
+
 class HelpCommand(commands.DefaultHelpCommand):
+    def __init__(self, **options) -> None:
+        super().__init__(**options)
+        self._cache_key: Optional[tuple[str, str, str]] = None
+
+    def _has_checks(self, command: commands.Command) -> bool:
+        cog = command.cog
+        return bool(
+            command.checks
+            or self.context.bot._checks
+            or self.context.bot._check_once
+            or (cog is not None and commands.Cog._get_overridden_method(cog.cog_check) is not None)
+        )
+
+    async def filter_commands(
+        self, cmds: Iterable[commands.Command], /, *, sort: bool = False, key=None
+    ) -> list[commands.Command]:
+        cmds = list(cmds)
+        if self.verify_checks is not False:
+            listed = cmds if self.show_hidden else [cmd for cmd in cmds if not cmd.hidden]
+            # which of these are listed depends on who is asking, so the page isn't shared
+            if any(map(self._has_checks, listed)):
+                self._cache_key = None
+
+        return await super().filter_commands(cmds, sort=sort, key=key)
+
     def _format_page(self, page: str) -> str:
         FORMAT_DICT = {
             "prefix": self.context.clean_prefix
@@ -27,59 +101,82 @@ class HelpCommand(commands.DefaultHelpCommand):
     
     @discord.utils.copy_doc(commands.DefaultHelpCommand.send_pages)
     async def send_pages(self) -> None:
+        pages = [self._format_page(page) for page in self.paginator.pages]
+        if self._cache_key is not None:
+            index.store_pages(self._cache_key, pages)
+
+        await self._send_formatted(pages)
+
+    async def _send_formatted(self, pages: list[str]) -> None:
         destination = self.get_destination()
-        for page in self.paginator.pages:
-            fmt_page = self._format_page(page)
-            await destination.send(fmt_page)
-            
+        for page in pages:
+            await destination.send(page)
+
+    async def _send_cached(self, kind: str, name: str) -> bool:
+        key = (kind, name, self.context.clean_prefix)
+        pages = index.get_pages(key)
+        if pages is not None:
+            await self._send_formatted(pages)
+            return True
+
+        self._cache_key = key
+        return False
+
     async def command_callback(
         self, ctx: commands.Context, /, *, command: Optional[str] = None
     ) -> None:
         """base command_callback function but made case insensitive
         """
-        
+
         await self.prepare_help_command(ctx, command)
 
-        bot: commands.Bot = ctx.bot
+        bot: Amyrin = ctx.bot
+        index.ensure(bot)
 
         if command is None:
+            if await self._send_cached("bot", ""):
+                return
             mapping = self.get_bot_mapping()
             return await self.send_bot_help(mapping)
 
-        cog = discord.utils.find(lambda x: x[0].lower() == command, bot.cogs.items())
+        key = " ".join(command.lower().split())
+
+        cog = index.cogs.get(key)
         if cog is not None:
-            return await self.send_cog_help(cog[1])
+            if await self._send_cached("cog", cog.qualified_name):
+                return
+            return await self.send_cog_help(cog)
 
+        cmd = index.commands.get(key)
+        if cmd is not None:
+            if isinstance(cmd, commands.Group):
+                if await self._send_cached("group", cmd.qualified_name):
+                    return
+                return await self.send_group_help(cmd)
+            else:
+                if await self._send_cached("command", cmd.qualified_name):
+                    return
+                return await self.send_command_help(cmd)
+
+        # not in the index, walk the keys only to find out which part is wrong
         maybe_coro = discord.utils.maybe_coroutine
 
-        keys = command.split(" ")
-        cmd = bot.all_commands.get(keys[0].lower())
+        keys = key.split(" ")
+        cmd = index.commands.get(keys[0])
         if cmd is None:
             string = await maybe_coro(
                 self.command_not_found, self.remove_mentions(keys[0])
             )
             return await self.send_error_message(string)
 
-        for key in keys[1:]:
-            try:
-                found = cmd.all_commands.get(key)  # type: ignore
-            except AttributeError:
+        for position, sub in enumerate(keys[1:], start=2):
+            found = index.commands.get(" ".join(keys[:position]))
+            if found is None:
                 string = await maybe_coro(
-                    self.subcommand_not_found, cmd, self.remove_mentions(key)
+                    self.subcommand_not_found, cmd, self.remove_mentions(sub)
                 )
                 return await self.send_error_message(string)
-            else:
-                if found is None:
-                    string = await maybe_coro(
-                        self.subcommand_not_found, cmd, self.remove_mentions(key)
-                    )
-                    return await self.send_error_message(string)
-                cmd = found
-
-        if isinstance(cmd, commands.Group):
-            return await self.send_group_help(cmd)
-        else:
-            return await self.send_command_help(cmd)
+            cmd = found
         
     
 async def setup(bot: Amyrin):
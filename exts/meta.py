@@ -1,15 +1,115 @@
+import math
+
 from discord.ext import commands
 from core import Amyrin
+from core.prefixes import MAX_PREFIX_LENGTH
+
+
+def format_latency(latency: float) -> str:
+    # a cluster whose shards haven't connected yet reports nan or inf
+    if not math.isfinite(latency):
+        return "n/a"
+    return f"{int(latency * 1000)}ms"
 
 
 class Cog(commands.Cog, name="Meta"):
     def __init__(self, bot: Amyrin) -> None:
         self.bot = bot
-    
+
+    async def cog_load(self) -> None:
+        if self.bot.ipc is not None:
+            self.bot.ipc.add_handler("ping", self.ipc_ping)
+
+    async def cog_unload(self) -> None:
+        if self.bot.ipc is not None:
+            self.bot.ipc.remove_handler("ping")
+
+    async def ipc_ping(self, _) -> dict:
+        return {
+            "shards": self.bot.shard_ids,
+            "latency": self.bot.latency,
+        }
+
     @commands.command()
     async def ping(self, ctx: commands.Context):
-        fmt_ping = int(self.bot.latency * 1000)
-        await ctx.send(f"{fmt_ping}ms")
-    
+        if self.bot.ipc is None:
+            return await ctx.send(format_latency(self.bot.latency))
+
+        results = await self.bot.ipc.broadcast("ping")
+        lines = []
+        for result in results:
+            if "error" in result:
+                lines.append(f"cluster {result['cluster_id']}: {result['error']}")
+                continue
+
+            data = result["data"]
+            shards = data["shards"]
+            lines.append(
+                f"cluster {result['cluster_id']} (shards {shards[0]}-{shards[-1]}): {format_latency(data['latency'])}"
+            )
+
+        await ctx.send("\n".join(lines))
+
+    def check_prefix(self, prefix: str | None) -> str | None:
+        if prefix is None:
+            return None
+        if not prefix.strip() or len(prefix) > MAX_PREFIX_LENGTH:
+            raise commands.BadArgument(f"Prefixes need to be between 1 and {MAX_PREFIX_LENGTH} characters long.")
+        return prefix
+
+    @commands.group(invoke_without_command=True)
+    async def prefix(self, ctx: commands.Context):
+        """Shows the prefixes you can use here
+
+        Examples:
+
+          {prefix}prefix
+        """
+
+        prefixes = self.bot.prefixes.resolve(ctx.author.id, ctx.guild.id if ctx.guild else None)
+        await ctx.send(", ".join(f"`{prefix}`" for prefix in prefixes))
+
+    @prefix.command(name="guild", aliases=["server"])
+    @commands.guild_only()
+    @commands.has_guild_permissions(manage_guild=True)
+    async def prefix_guild(self, ctx: commands.Context, prefix: str | None = None):
+        """Sets the prefix of this server, leave it out to go back to the default
+
+        Examples:
+
+          {prefix}prefix guild ?
+          {prefix}prefix guild
+
+        Parameters
+        -----------
+        prefix: str
+            The new prefix
+        """
+
+        prefix = self.check_prefix(prefix)
+        self.bot.prefixes.set_guild(ctx.guild.id, prefix) # type: ignore
+        await ctx.send(f"The prefix of this server is now `{prefix or self.bot.prefixes.default}`.")
+
+    @prefix.command(name="user", aliases=["me"])
+    async def prefix_user(self, ctx: commands.Context, prefix: str | None = None):
+        """Sets a personal prefix that works everywhere, leave it out to remove it
+
+        Examples:
+
+          {prefix}prefix user ?
+          {prefix}prefix user
+
+        Parameters
+        -----------
+        prefix: str
+            The new prefix
+        """
+
+        prefix = self.check_prefix(prefix)
+        self.bot.prefixes.set_user(ctx.author.id, prefix)
+        if prefix is None:
+            return await ctx.send("Removed your personal prefix.")
+        await ctx.send(f"Your personal prefix is now `{prefix}`.")
+
 async def setup(bot: Amyrin):
-    await bot.add_cog(Cog(bot=bot))
\ No newline at end of file
+    await bot.add_cog(Cog(bot=bot))
@@ -1,4 +1,20 @@
-from core.bot import Amyrin
+from core.config import get_config
 
-bot = Amyrin()
-bot.run(bot.config["token"])
\ No newline at end of file
+
+def main() -> None:
+    config = get_config()
+
+    if config.cluster.get("enabled"):
+        from core.cluster import Launcher
+
+        Launcher(config).run()
+    else:
+        from core.bot import Amyrin
+
+        bot = Amyrin(config=config)
+        bot.run(config.token)
+
+
+# processes started with spawn import this module again, they mustn't start another bot
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,4 @@
-from .executor import executor, run_blocking_func
+from .attachments import AttachmentLimits, download_attachments
+from .executor import configure_pools, executor, pools, run_blocking_func, run_in_pool, shutdown_pools
+from .paginator import PAGE_SIZE, Paginator, codeblock, paginate
 from .updater import Updater
\ No newline at end of file
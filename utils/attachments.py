@@ -0,0 +1,109 @@
+import asyncio
+import tempfile
+from dataclasses import dataclass, field
+from typing import Sequence
+
+import discord
+from aiohttp import ClientSession
+
+from .executor import run_in_pool
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class AttachmentLimits:
+    concurrency: int = 4
+    max_file_size: int = 25 * 1024 * 1024
+    max_total_size: int = 25 * 1024 * 1024
+    # files are kept in memory up to this size and spooled to disk past it
+    spool_threshold: int = 1024 * 1024
+
+    @classmethod
+    def from_config(cls, config: dict) -> "AttachmentLimits":
+        unknown = set(config) - set(cls.__dataclass_fields__)
+        if unknown:
+            raise TypeError(f'attachments key in config contains unknown keys: {", ".join(unknown)}')
+        return cls(**config)
+
+
+@dataclass
+class DownloadResult:
+    files: list[discord.File] = field(default_factory=list)
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+
+
+async def _download(
+    session: ClientSession, attachment: discord.Attachment, limits: AttachmentLimits
+) -> discord.File:
+    fp = tempfile.SpooledTemporaryFile(max_size=limits.spool_threshold)
+    try:
+        async with session.get(attachment.url) as resp:
+            resp.raise_for_status()
+            size = 0
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                if size > limits.max_file_size:
+                    raise ValueError("grew past the size limit while downloading")
+                if size > limits.spool_threshold:
+                    # rolled over to disk, so the write blocks
+                    await run_in_pool("io", fp.write, chunk)
+                else:
+                    fp.write(chunk)
+    except BaseException:
+        fp.close()
+        raise
+
+    fp.seek(0)
+    return discord.File(
+        fp,  # type: ignore
+        filename=attachment.filename,
+        spoiler=attachment.is_spoiler(),
+        description=attachment.description,
+    )
+
+
+async def download_attachments(
+    attachments: Sequence[discord.Attachment],
+    limits: AttachmentLimits,
+    session: ClientSession | None = None,
+) -> DownloadResult:
+    """downloads attachments concurrently so they can be sent again
+
+    attachments over the per file limit, or that would push the total over
+    the total limit, are skipped before anything is downloaded
+    """
+
+    result = DownloadResult()
+    accepted: list[discord.Attachment] = []
+    total = 0
+    for attachment in attachments:
+        if attachment.size > limits.max_file_size:
+            result.skipped.append((attachment.filename, "too large"))
+        elif total + attachment.size > limits.max_total_size:
+            result.skipped.append((attachment.filename, "over the total size limit"))
+        else:
+            accepted.append(attachment)
+            total += attachment.size
+
+    semaphore = asyncio.Semaphore(limits.concurrency)
+    owns_session = session is None
+    session = session or ClientSession()
+
+    async def bounded(attachment: discord.Attachment) -> discord.File:
+        async with semaphore:
+            return await _download(session, attachment, limits)  # type: ignore
+
+    try:
+        files = await asyncio.gather(*map(bounded, accepted), return_exceptions=True)
+    finally:
+        if owns_session:
+            await session.close()
+
+    for attachment, file in zip(accepted, files):
+        if isinstance(file, BaseException):
+            result.skipped.append((attachment.filename, f"{type(file).__name__}: {file}"))
+        else:
+            result.files.append(file)
+
+    return result
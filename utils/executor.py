@@ -1,20 +1,132 @@
 import asyncio
 import functools
-from typing import Callable
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict) -> tuple[float, Any]:
+    started = time.monotonic()
+    return started, func(*args, **kwargs)
+
+
+class Pool:
+    """a named executor that keeps track of how busy it is"""
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix=f"amyrin-{self.name}"
+            )
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+
+        self.in_flight += 1
+        try:
+            started, result = await loop.run_in_executor(
+                self.executor, _timed_call, func, args, kwargs
+            )
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        wait = max(0.0, started - submitted)
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return result
+
+    def resize(self, max_workers: int) -> None:
+        if max_workers == self.max_workers:
+            return
+
+        self.max_workers = max_workers
+        old, self._executor = self._executor, None
+        if old is not None:
+            # let already submitted work finish on the old executor
+            old.shutdown(wait=False)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            # anything past the worker count is waiting for a free worker
+            "queue_depth": max(0, self.in_flight - self.max_workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+pools: dict[str, Pool] = {
+    "io": Pool("io", 8),
+}
+
+# pools that older configs may still size, see core.config
+RETIRED_POOLS = {"cpu", "git"}
+
+
+def configure_pools(sizes: dict[str, int]) -> None:
+    """resizes pools from the ``executors`` config section"""
+
+    for name, size in sizes.items():
+        if name not in pools:
+            raise TypeError(f'executors key in config contains unknown pool "{name}"')
+        if not isinstance(size, int) or size < 1:
+            raise TypeError(f"executors.{name} key in config needs to be a positive integer")
+        pools[name].resize(size)
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    for pool in pools.values():
+        pool.shutdown(wait=wait)
+
+
+async def run_in_pool(pool: str, func: Callable, *args, **kwargs):
+    return await pools[pool].run(func, *args, **kwargs)
 
 
 async def run_blocking_func(func: Callable, *args, **kwargs):
-    partial = functools.partial(func, *args, **kwargs)
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, partial)
+    return await run_in_pool("io", func, *args, **kwargs)
+
+
+def executor(executor: Optional[str] = None):
+    """runs the decorated function in the named pool, ``io`` by default"""
 
+    pool = executor or "io"
+    if pool not in pools:
+        raise ValueError(f'unknown executor pool "{pool}"')
 
-def executor(executor=None):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            return run_blocking_func(func, *args, **kwargs)
+            return run_in_pool(pool, func, *args, **kwargs)
 
         return wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
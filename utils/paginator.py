@@ -0,0 +1,84 @@
+import discord
+
+# leaves room for the codeblock around a page
+PAGE_SIZE = 1900
+
+
+def paginate(text: str, size: int = PAGE_SIZE) -> list[str]:
+    """splits text into pages on line boundaries, hard splitting lines that
+    are longer than a page"""
+
+    pages: list[str] = []
+    current = ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > size:
+            if current:
+                pages.append(current)
+                current = ""
+            pages.append(line[:size])
+            line = line[size:]
+
+        if len(current) + len(line) > size:
+            pages.append(current)
+            current = ""
+        current += line
+
+    if current or not pages:
+        pages.append(current)
+    return pages
+
+
+def codeblock(text: str, language: str = "py") -> str:
+    return f"```{language}\n{text.replace('``', '`​`')}```"
+
+
+class Paginator(discord.ui.View):
+    def __init__(self, author_id: int, pages: list[str], *, index: int = 0, timeout: float = 180) -> None:
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.pages = pages
+        self.index = index
+        self.message: discord.Message | None = None
+        self._update_buttons()
+
+    @property
+    def content(self) -> str:
+        return codeblock(self.pages[self.index])
+
+    def _update_buttons(self) -> None:
+        self.previous.disabled = self.index == 0
+        self.next.disabled = self.index >= len(self.pages) - 1
+        self.position.label = f"{self.index + 1}/{len(self.pages)}"
+
+    def set_pages(self, pages: list[str], index: int | None = None) -> None:
+        self.pages = pages
+        self.index = len(pages) - 1 if index is None else index
+        self._update_buttons()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    async def _show(self, interaction: discord.Interaction) -> None:
+        self._update_buttons()
+        await interaction.response.edit_message(content=self.content, view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        self.index = max(0, self.index - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="1/1", style=discord.ButtonStyle.secondary, disabled=True)
+    async def position(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        pass
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button) -> None:
+        self.index = min(len(self.pages) - 1, self.index + 1)
+        await self._show(interaction)
+
+    async def on_timeout(self) -> None:
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass